@@ -256,12 +256,11 @@ class CorrectionAwareConsensusEngine(ConsensusEngine):
         """Get learning progress and effectiveness metrics"""
         try:
             # Get correction statistics
-            from ..corrections.manager import CorrectionManager
-            correction_manager = CorrectionManager(self.memory_manager.db_manager)
+            correction_manager = self.memory_manager.db_manager.get_correction_manager()
             stats = await correction_manager.get_correction_statistics(project_id)
             
-            # Get recent corrections
-            recent_corrections = await correction_manager.get_corrections_for_project(project_id, 20)
+            # Get recent corrections; trends only read numeric fields
+            recent_corrections = await correction_manager.get_corrections_lite_for_project(project_id, 20)
             
             # Calculate learning trends
             learning_trends = self._calculate_learning_trends(recent_corrections)
@@ -425,7 +424,7 @@ class CorrectionAwareConsensusEngine(ConsensusEngine):
                 confidence_trend = 'insufficient_data'
             
             # Calculate feedback trend
-            feedback_scores = [c.feedback_score.value for c in recent_corrections 
+            feedback_scores = [c.feedback_score for c in recent_corrections 
                              if c.feedback_score is not None]
             if feedback_scores:
                 avg_feedback = sum(feedback_scores) / len(feedback_scores)
@@ -4,7 +4,7 @@ AI learning from user corrections and feedback during sessions.
 """
 
 from .types import (
-    UserCorrection, CorrectionType, CorrectionFeedback,
+    UserCorrection, CorrectionLite, CorrectionType, CorrectionFeedback,
     CorrectionPattern, SessionLearning
 )
 from .learner import CorrectionLearner
@@ -14,6 +14,7 @@ from .manager import CorrectionManager
 
 __all__ = [
     'UserCorrection',
+    'CorrectionLite',
     'CorrectionType', 
     'CorrectionFeedback',
     'CorrectionPattern',
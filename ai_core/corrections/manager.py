@@ -3,53 +3,172 @@ Correction Manager
 Database operations and management for correction learning system.
 """
 
+import asyncio
+import copy
 import json
 import logging
+import sqlite3
 import time
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 
 from .types import (
-    UserCorrection, CorrectionPattern, SessionLearning, CorrectionStats,
+    UserCorrection, CorrectionLite, CorrectionPattern, SessionLearning, CorrectionStats,
     CorrectionType, FeedbackScore, CorrectionPatternType
 )
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; statistics fall back to a pure Python pass
+    np = None
+
 logger = logging.getLogger(__name__)
 
+# Serialized forms of empty JSON containers; most corrections carry no
+# context/metadata, so these skip the encoder and decoder entirely.
+_EMPTY_OBJ = "{}"
+_EMPTY_ARR = "[]"
+
+# Upper bound on serialized JSON columns so one oversized row cannot blow
+# out the page cache for every subsequent range scan
+MAX_JSON_COLUMN_SIZE = 16384
+
+
+def _dumps_obj(value: Dict[str, Any]) -> str:
+    """Serialize a JSON object column, short-circuiting the empty case"""
+    return json.dumps(value) if value else _EMPTY_OBJ
+
+
+def _dumps_arr(value: List[Any]) -> str:
+    """Serialize a JSON array column, short-circuiting the empty case"""
+    return json.dumps(value) if value else _EMPTY_ARR
+
+
+def _cap_obj(raw: str, column: str) -> str:
+    """Replace an oversized JSON object column with a truncation marker"""
+    if len(raw) <= MAX_JSON_COLUMN_SIZE:
+        return raw
+    logger.warning(f"Truncating oversized {column} column ({len(raw)} chars)")
+    return json.dumps({"_truncated": True, "size": len(raw)})
+
+
+def _cap_arr(value: List[Any], raw: str, column: str) -> str:
+    """Trim an oversized JSON array column to its most recent entries"""
+    if len(raw) <= MAX_JSON_COLUMN_SIZE:
+        return raw
+    logger.warning(f"Truncating oversized {column} column ({len(raw)} chars)")
+    while len(raw) > MAX_JSON_COLUMN_SIZE:
+        value = value[len(value) // 2 + 1:]
+        raw = _dumps_arr(value)
+    return raw
+
+
+def _loads_obj(raw: Optional[str]) -> Dict[str, Any]:
+    """Deserialize a JSON object column without parsing empty values"""
+    if not raw or raw == _EMPTY_OBJ:
+        return {}
+    return json.loads(raw)
+
+
+def _loads_arr(raw: Optional[str]) -> List[Any]:
+    """Deserialize a JSON array column without parsing empty values"""
+    if not raw or raw == _EMPTY_ARR:
+        return []
+    return json.loads(raw)
+
+
+def _aggregate_correction_rows(rows: List[Tuple]) -> Tuple:
+    """Aggregate (correction_type, confidence, feedback_score) rows.
+
+    Returns the same column layout as the correction_stats table minus
+    patterns_learned, plus a per-type count dictionary.
+    """
+    if np is not None and rows:
+        count = len(rows)
+        confidence = np.fromiter((r[1] or 0.0 for r in rows), dtype=np.float64, count=count)
+        feedback = np.fromiter(
+            (np.nan if r[2] is None else r[2] for r in rows), dtype=np.float64, count=count
+        )
+        types, type_counts = np.unique([r[0] for r in rows], return_counts=True)
+        confident = confidence > 0
+        has_feedback = ~np.isnan(feedback)
+        return (
+            count,
+            float(confidence[confident].sum()),
+            int(confident.sum()),
+            float(np.nansum(feedback)),
+            int(has_feedback.sum()),
+            int((feedback[has_feedback] > 0).sum()),
+            dict(zip(types.tolist(), type_counts.tolist()))
+        )
+
+    confidence_sum = 0.0
+    confidence_count = feedback_sum = feedback_count = positive_feedback_count = 0
+    corrections_by_type: Dict[str, int] = {}
+    for correction_type, confidence, feedback_score in rows:
+        corrections_by_type[correction_type] = corrections_by_type.get(correction_type, 0) + 1
+        if confidence and confidence > 0:
+            confidence_sum += confidence
+            confidence_count += 1
+        if feedback_score is not None:
+            feedback_sum += feedback_score
+            feedback_count += 1
+            positive_feedback_count += feedback_score > 0
+    return (len(rows), confidence_sum, confidence_count, feedback_sum,
+            feedback_count, positive_feedback_count, corrections_by_type)
+
 
 class CorrectionManager:
     """Manages database operations for correction learning"""
     
-    def __init__(self, db_manager):
+    # Pages reclaimed per cleanup and deletions that trigger PRAGMA optimize
+    INCREMENTAL_VACUUM_PAGES = 1000
+    OPTIMIZE_THRESHOLD = 100
+    
+    # Result sets larger than this are decoded in a worker thread
+    THREADED_DECODE_THRESHOLD = 32
+    
+    def __init__(self, db_manager, correction_cache_size: int = 1024,
+                 patterns_cache_ttl: float = 30.0, write_behind: bool = False,
+                 write_batch_size: int = 128, write_flush_interval: float = 0.01):
         self.db_manager = db_manager
+
+        # Read caches: corrections are immutable once stored, patterns are
+        # invalidated per project whenever a new correction or pattern is
+        # written. Callers always receive copies so they cannot mutate entries.
+        self._correction_cache: "OrderedDict[int, UserCorrection]" = OrderedDict()
+        self._correction_cache_size = correction_cache_size
+        self._patterns_cache: Dict[str, Tuple[float, List[CorrectionPattern]]] = {}
+        self._patterns_cache_ttl = patterns_cache_ttl
+
+        # Cache statistics
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # Optional write-behind queue: concurrent store_correction calls are
+        # coalesced into one transaction (and one commit) per batch
+        self.write_behind = write_behind
+        self.write_batch_size = write_batch_size
+        self.write_flush_interval = write_flush_interval
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._write_task: Optional[asyncio.Task] = None
     
     async def store_correction(self, correction: UserCorrection) -> Optional[int]:
         """Store a user correction in the database"""
+        if self.write_behind:
+            if self._write_task is None:
+                self._write_queue = asyncio.Queue()
+                self._write_task = asyncio.create_task(self._drain_writes())
+            
+            future = asyncio.get_running_loop().create_future()
+            await self._write_queue.put((correction, future))
+            return await future
+        
         try:
             async with self.db_manager.get_connection() as db:
-                cursor = await db.execute("""
-                    INSERT INTO user_corrections (
-                        session_id, query_id, project_id, original_query, corrected_query,
-                        correction_type, feedback_score, correction_reason, context,
-                        timestamp, applied, confidence, metadata
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    correction.session_id,
-                    correction.query_id,
-                    correction.project_id,
-                    correction.original_query,
-                    correction.corrected_query,
-                    correction.correction_type.value,
-                    correction.feedback_score.value if correction.feedback_score else None,
-                    correction.correction_reason,
-                    json.dumps(correction.context),
-                    correction.timestamp,
-                    correction.applied,
-                    correction.confidence,
-                    json.dumps(correction.metadata)
-                ))
-                
-                correction_id = cursor.lastrowid
+                correction_id = await self._insert_correction(db, correction)
                 await db.commit()
+                self._invalidate_correction(correction, correction_id)
                 
                 logger.debug(f"Stored correction with ID: {correction_id}")
                 return correction_id
@@ -58,8 +177,108 @@ class CorrectionManager:
             logger.error(f"Error storing correction: {e}")
             return None
     
+    async def close(self) -> None:
+        """Flush queued corrections and stop the write-behind task"""
+        if self._write_task is None:
+            return
+        
+        await self._write_queue.join()
+        self._write_task.cancel()
+        try:
+            await self._write_task
+        except asyncio.CancelledError:
+            pass
+        self._write_task = None
+    
+    async def _insert_correction(self, db, correction: UserCorrection) -> Optional[int]:
+        """Insert a correction on an open connection without committing"""
+        cursor = await db.execute("""
+            INSERT INTO user_corrections (
+                session_id, query_id, project_id, original_query, corrected_query,
+                correction_type, feedback_score, correction_reason, context,
+                timestamp, applied, confidence, metadata
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING id
+        """, (
+            correction.session_id,
+            correction.query_id,
+            correction.project_id,
+            correction.original_query,
+            correction.corrected_query,
+            correction.correction_type.value,
+            correction.feedback_score.value if correction.feedback_score else None,
+            correction.correction_reason,
+            _cap_obj(_dumps_obj(correction.context), 'context'),
+            correction.timestamp,
+            correction.applied,
+            correction.confidence,
+            _cap_obj(_dumps_obj(correction.metadata), 'metadata')
+        ))
+        
+        row = await cursor.fetchone()
+        return row[0] if row else None
+    
+    async def _drain_writes(self) -> None:
+        """Background consumer that commits queued corrections in batches"""
+        queue = self._write_queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.write_batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), self.write_flush_interval))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._store_correction_batch(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    async def _store_correction_batch(self, batch: List[Tuple[UserCorrection, asyncio.Future]]) -> None:
+        """Store a batch of corrections in a single transaction"""
+        try:
+            async with self.db_manager.get_connection() as db:
+                try:
+                    correction_ids = [
+                        await self._insert_correction(db, correction) for correction, _ in batch
+                    ]
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    raise
+        except Exception as e:
+            # One invalid row must not fail the rest; retry individually
+            logger.warning(f"Batch correction write failed, retrying individually: {e}")
+            for correction, future in batch:
+                if future.done():
+                    continue
+                try:
+                    async with self.db_manager.get_connection() as db:
+                        correction_id = await self._insert_correction(db, correction)
+                        await db.commit()
+                    self._invalidate_correction(correction, correction_id)
+                    future.set_result(correction_id)
+                except Exception as e:
+                    logger.error(f"Error storing correction: {e}")
+                    future.set_result(None)
+            return
+        
+        logger.debug(f"Stored batch of {len(batch)} corrections")
+        for (correction, future), correction_id in zip(batch, correction_ids):
+            self._invalidate_correction(correction, correction_id)
+            if not future.done():
+                future.set_result(correction_id)
+    
     async def get_correction(self, correction_id: int) -> Optional[UserCorrection]:
         """Get a correction by ID"""
+        cached = self._correction_cache.get(correction_id)
+        if cached is not None:
+            self._correction_cache.move_to_end(correction_id)
+            self.cache_hits += 1
+            return copy.deepcopy(cached)
+        self.cache_misses += 1
+
         try:
             async with self.db_manager.get_connection() as db:
                 cursor = await db.execute("""
@@ -72,7 +291,10 @@ class CorrectionManager:
                 
                 row = await cursor.fetchone()
                 if row:
-                    return self._row_to_correction(row)
+                    correction = self._row_to_correction(row)
+                    if correction:
+                        self._cache_correction(copy.deepcopy(correction))
+                    return correction
                 
                 return None
                 
@@ -80,6 +302,42 @@ class CorrectionManager:
             logger.error(f"Error getting correction {correction_id}: {e}")
             return None
     
+    async def get_correction_applied(self, correction_id: int) -> Optional[bool]:
+        """Get whether a correction has been applied, without decoding the row"""
+        cached = self._correction_cache.get(correction_id)
+        if cached is not None:
+            self._correction_cache.move_to_end(correction_id)
+            self.cache_hits += 1
+            return bool(cached.applied)
+        
+        value = await self._get_correction_column(correction_id, 'applied')
+        return bool(value) if value is not None else None
+    
+    async def get_correction_confidence(self, correction_id: int) -> Optional[float]:
+        """Get a correction's confidence, without decoding the row"""
+        cached = self._correction_cache.get(correction_id)
+        if cached is not None:
+            self._correction_cache.move_to_end(correction_id)
+            self.cache_hits += 1
+            return cached.confidence
+        
+        return await self._get_correction_column(correction_id, 'confidence')
+    
+    async def _get_correction_column(self, correction_id: int, column: str) -> Any:
+        """Read a single scalar column of a correction (column is never user input)"""
+        self.cache_misses += 1
+        try:
+            async with self.db_manager.get_connection() as db:
+                cursor = await db.execute(
+                    f"SELECT {column} FROM user_corrections WHERE id = ?", (correction_id,)
+                )
+                row = await cursor.fetchone()
+                return row[0] if row else None
+                
+        except Exception as e:
+            logger.error(f"Error getting {column} for correction {correction_id}: {e}")
+            return None
+    
     async def get_corrections_for_session(self, session_id: str, 
                                         project_id: str) -> List[UserCorrection]:
         """Get all corrections for a session"""
@@ -94,13 +352,9 @@ class CorrectionManager:
                     ORDER BY timestamp ASC
                 """, (session_id, project_id))
                 
-                corrections = []
-                async for row in cursor:
-                    correction = self._row_to_correction(row)
-                    if correction:
-                        corrections.append(correction)
-                
-                return corrections
+                rows = await cursor.fetchall()
+            
+            return await self._decode_corrections(rows)
                 
         except Exception as e:
             logger.error(f"Error getting corrections for session {session_id}: {e}")
@@ -121,13 +375,31 @@ class CorrectionManager:
                     LIMIT ?
                 """, (project_id, limit))
                 
-                corrections = []
-                async for row in cursor:
-                    correction = self._row_to_correction(row)
-                    if correction:
-                        corrections.append(correction)
+                rows = await cursor.fetchall()
+            
+            return await self._decode_corrections(rows)
                 
-                return corrections
+        except Exception as e:
+            logger.error(f"Error getting corrections for project {project_id}: {e}")
+            return []
+    
+    async def get_corrections_lite_for_project(self, project_id: str,
+                                             limit: int = 100) -> List[CorrectionLite]:
+        """Get recent corrections for a project without enum or JSON decoding"""
+        try:
+            async with self.db_manager.get_connection() as db:
+                cursor = await db.execute("""
+                    SELECT id, session_id, query_id, project_id, original_query, corrected_query,
+                           correction_type, feedback_score, correction_reason, context,
+                           timestamp, applied, confidence, metadata
+                    FROM user_corrections
+                    WHERE project_id = ?
+                    ORDER BY timestamp DESC
+                    LIMIT ?
+                """, (project_id, limit))
+                
+                rows = await cursor.fetchall()
+                return [self._row_to_correction_lite(row) for row in rows]
                 
         except Exception as e:
             logger.error(f"Error getting corrections for project {project_id}: {e}")
@@ -142,21 +414,25 @@ class CorrectionManager:
                         project_id, pattern_type, pattern_data, source_corrections,
                         confidence, usage_count, success_rate, created_at, last_applied, metadata
                     ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    RETURNING id
                 """, (
                     pattern.project_id,
                     pattern.pattern_type.value,
-                    json.dumps(pattern.pattern_data),
-                    json.dumps(pattern.source_corrections),
+                    _cap_obj(_dumps_obj(pattern.pattern_data), 'pattern_data'),
+                    _cap_arr(pattern.source_corrections,
+                             _dumps_arr(pattern.source_corrections), 'source_corrections'),
                     pattern.confidence,
                     pattern.usage_count,
                     pattern.success_rate,
                     pattern.created_at,
                     pattern.last_applied,
-                    json.dumps(pattern.metadata)
+                    _cap_obj(_dumps_obj(pattern.metadata), 'metadata')
                 ))
                 
-                pattern_id = cursor.lastrowid
+                row = await cursor.fetchone()
+                pattern_id = row[0] if row else None
                 await db.commit()
+                self._patterns_cache.pop(pattern.project_id, None)
                 
                 logger.debug(f"Stored correction pattern with ID: {pattern_id}")
                 return pattern_id
@@ -167,6 +443,12 @@ class CorrectionManager:
     
     async def get_correction_patterns(self, project_id: str) -> List[CorrectionPattern]:
         """Get correction patterns for a project"""
+        cached = self._patterns_cache.get(project_id)
+        if cached is not None and time.time() - cached[0] < self._patterns_cache_ttl:
+            self.cache_hits += 1
+            return copy.deepcopy(cached[1])
+        self.cache_misses += 1
+
         try:
             async with self.db_manager.get_connection() as db:
                 cursor = await db.execute("""
@@ -183,6 +465,7 @@ class CorrectionManager:
                     if pattern:
                         patterns.append(pattern)
                 
+                self._patterns_cache[project_id] = (time.time(), copy.deepcopy(patterns))
                 return patterns
                 
         except Exception as e:
@@ -198,15 +481,17 @@ class CorrectionManager:
                     INSERT OR REPLACE INTO session_learning (
                         session_id, project_id, learning_data, created_at, expires_at
                     ) VALUES (?, ?, ?, ?, ?)
+                    RETURNING id
                 """, (
                     session_learning.session_id,
                     session_learning.project_id,
-                    json.dumps(session_learning.learning_data),
+                    _dumps_obj(session_learning.learning_data),
                     session_learning.created_at,
                     session_learning.expires_at
                 ))
                 
-                learning_id = cursor.lastrowid
+                row = await cursor.fetchone()
+                learning_id = row[0] if row else None
                 await db.commit()
                 
                 return learning_id
@@ -232,7 +517,7 @@ class CorrectionManager:
                         id=row[0],
                         session_id=row[1],
                         project_id=row[2],
-                        learning_data=json.loads(row[3]),
+                        learning_data=_loads_obj(row[3]),
                         created_at=row[4],
                         expires_at=row[5]
                     )
@@ -246,17 +531,26 @@ class CorrectionManager:
     async def cleanup_expired_session_learning(self) -> int:
         """Clean up expired session learning data"""
         try:
-            current_time = time.time()
-            
             async with self.db_manager.get_connection() as db:
+                # expires_at holds Unix time; derive "now" in SQL so there is
+                # no bound parameter and the expiry index range is constant
                 cursor = await db.execute("""
                     DELETE FROM session_learning
-                    WHERE expires_at < ?
-                """, (current_time,))
+                    WHERE expires_at < (julianday('now') - 2440587.5) * 86400.0
+                """)
                 
                 deleted_count = cursor.rowcount
                 await db.commit()
                 
+                if deleted_count > 0:
+                    # Reclaim freed pages; executescript steps the pragma to
+                    # completion (execute would free a single page)
+                    await db.executescript(
+                        f"PRAGMA incremental_vacuum({self.INCREMENTAL_VACUUM_PAGES})"
+                    )
+                if deleted_count > self.OPTIMIZE_THRESHOLD:
+                    await db.execute("PRAGMA optimize")
+                
                 logger.info(f"Cleaned up {deleted_count} expired session learning records")
                 return deleted_count
                 
@@ -267,73 +561,154 @@ class CorrectionManager:
     async def get_correction_statistics(self, project_id: str) -> CorrectionStats:
         """Get correction statistics for a project"""
         try:
-            stats = CorrectionStats()
+            # Independent reads run concurrently on separate pooled connections
+            try:
+                row, corrections_by_type = await asyncio.gather(
+                    self._query_total_stats(project_id),
+                    self._query_type_counts(project_id)
+                )
+            except sqlite3.OperationalError as e:
+                # Aggregate tables unavailable (e.g. schema not migrated)
+                logger.warning(f"Correction aggregates unavailable, scanning rows: {e}")
+                row, corrections_by_type = await self._scan_total_stats(project_id)
+            if not row:
+                return CorrectionStats()
             
-            async with self.db_manager.get_connection() as db:
-                # Total corrections
-                cursor = await db.execute("""
-                    SELECT COUNT(*) FROM user_corrections WHERE project_id = ?
-                """, (project_id,))
-                row = await cursor.fetchone()
-                stats.total_corrections = row[0] if row else 0
+            return self._build_stats(row, corrections_by_type)
                 
-                # Corrections by type
+        except Exception as e:
+            logger.error(f"Error getting correction statistics: {e}")
+            return CorrectionStats()
+    
+    async def get_correction_metrics_for_project(self, project_id: str,
+                                               limit: int = 10000) -> CorrectionStats:
+        """Get statistics over the most recent corrections for a project.
+        
+        Only the numeric columns are read, so no JSON or enum decoding is
+        done; suitable for bulk analytics over large windows.
+        """
+        try:
+            async with self.db_manager.get_connection() as db:
                 cursor = await db.execute("""
-                    SELECT correction_type, COUNT(*) 
-                    FROM user_corrections 
+                    SELECT correction_type, confidence, feedback_score
+                    FROM user_corrections
                     WHERE project_id = ?
-                    GROUP BY correction_type
-                """, (project_id,))
-                
-                async for row in cursor:
-                    stats.corrections_by_type[row[0]] = row[1]
-                
-                # Average confidence
-                cursor = await db.execute("""
-                    SELECT AVG(confidence) 
-                    FROM user_corrections 
-                    WHERE project_id = ? AND confidence > 0
-                """, (project_id,))
-                row = await cursor.fetchone()
-                stats.average_confidence = row[0] if row and row[0] else 0.0
-                
-                # Patterns learned
-                cursor = await db.execute("""
-                    SELECT COUNT(*) FROM correction_patterns WHERE project_id = ?
-                """, (project_id,))
-                row = await cursor.fetchone()
-                stats.patterns_learned = row[0] if row else 0
-                
-                # Success rate (positive feedback ratio)
-                cursor = await db.execute("""
-                    SELECT 
-                        SUM(CASE WHEN feedback_score > 0 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) 
-                    FROM user_corrections 
-                    WHERE project_id = ? AND feedback_score IS NOT NULL
-                """, (project_id,))
-                row = await cursor.fetchone()
-                stats.success_rate = row[0] if row and row[0] else 0.0
-                
-                # User satisfaction (average feedback score normalized)
-                cursor = await db.execute("""
-                    SELECT AVG(feedback_score) 
-                    FROM user_corrections 
-                    WHERE project_id = ? AND feedback_score IS NOT NULL
-                """, (project_id,))
-                row = await cursor.fetchone()
-                if row and row[0] is not None:
-                    stats.user_satisfaction = (row[0] + 1) / 2  # Normalize -1,1 to 0,1
-                
-                # Learning velocity
-                if stats.total_corrections > 0:
-                    stats.learning_velocity = stats.patterns_learned / stats.total_corrections
-                
-                return stats
-                
+                    ORDER BY timestamp DESC
+                    LIMIT ?
+                """, (project_id, limit))
+                rows = await cursor.fetchall()
+            
+            if not rows:
+                return CorrectionStats()
+            
+            *totals, corrections_by_type = _aggregate_correction_rows(rows)
+            return self._build_stats((*totals, 0), corrections_by_type)
+            
         except Exception as e:
-            logger.error(f"Error getting correction statistics: {e}")
+            logger.error(f"Error getting correction metrics for project {project_id}: {e}")
             return CorrectionStats()
     
+    @staticmethod
+    def _build_stats(row: Tuple, corrections_by_type: Dict[str, int]) -> CorrectionStats:
+        """Build CorrectionStats from a correction_stats-shaped aggregate row"""
+        (total, confidence_sum, confidence_count, feedback_sum,
+         feedback_count, positive_feedback_count, patterns_learned) = row
+        
+        stats = CorrectionStats()
+        stats.total_corrections = total
+        stats.patterns_learned = patterns_learned
+        stats.corrections_by_type = corrections_by_type
+        if confidence_count > 0:
+            stats.average_confidence = confidence_sum / confidence_count
+        if feedback_count > 0:
+            stats.success_rate = positive_feedback_count / feedback_count
+            # Normalize -1,1 to 0,1
+            stats.user_satisfaction = (feedback_sum / feedback_count + 1) / 2
+        
+        # Learning velocity
+        if stats.total_corrections > 0:
+            stats.learning_velocity = stats.patterns_learned / stats.total_corrections
+        
+        return stats
+    
+    async def _query_total_stats(self, project_id: str) -> Optional[Tuple]:
+        """Fetch the trigger-maintained aggregate row for a project"""
+        async with self.db_manager.get_connection() as db:
+            cursor = await db.execute("""
+                SELECT total_corrections, confidence_sum, confidence_count,
+                       feedback_sum, feedback_count, positive_feedback_count,
+                       patterns_learned
+                FROM correction_stats
+                WHERE project_id = ?
+            """, (project_id,))
+            return await cursor.fetchone()
+    
+    async def _scan_total_stats(self, project_id: str) -> Tuple[Optional[Tuple], Dict[str, int]]:
+        """Compute aggregate statistics from raw correction rows"""
+        async with self.db_manager.get_connection() as db:
+            cursor = await db.execute("""
+                SELECT correction_type, confidence, feedback_score
+                FROM user_corrections
+                WHERE project_id = ?
+            """, (project_id,))
+            rows = await cursor.fetchall()
+            cursor = await db.execute("""
+                SELECT COUNT(*) FROM correction_patterns WHERE project_id = ?
+            """, (project_id,))
+            patterns_row = await cursor.fetchone()
+        
+        patterns_learned = patterns_row[0] if patterns_row else 0
+        if not rows and not patterns_learned:
+            return None, {}
+        
+        *totals, corrections_by_type = _aggregate_correction_rows(rows)
+        return (*totals, patterns_learned), corrections_by_type
+    
+    async def _query_type_counts(self, project_id: str) -> Dict[str, int]:
+        """Fetch per-type correction counts for a project"""
+        async with self.db_manager.get_connection() as db:
+            cursor = await db.execute("""
+                SELECT correction_type, count
+                FROM correction_type_stats
+                WHERE project_id = ? AND count > 0
+            """, (project_id,))
+            return {row[0]: row[1] async for row in cursor}
+    
+    async def _decode_corrections(self, rows: List[Tuple]) -> List[UserCorrection]:
+        """Decode correction rows, off the event loop for large result sets"""
+        if len(rows) > self.THREADED_DECODE_THRESHOLD:
+            return await asyncio.to_thread(self._decode_correction_rows, rows)
+        return self._decode_correction_rows(rows)
+    
+    def _decode_correction_rows(self, rows: List[Tuple]) -> List[UserCorrection]:
+        """Decode correction rows, dropping any that fail to convert"""
+        return [c for c in map(self._row_to_correction, rows) if c]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get read cache statistics"""
+        total_requests = self.cache_hits + self.cache_misses
+        return {
+            'corrections_cached': len(self._correction_cache),
+            'max_corrections_cached': self._correction_cache_size,
+            'projects_cached': len(self._patterns_cache),
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'hit_rate': self.cache_hits / total_requests if total_requests > 0 else 0.0
+        }
+    
+    def _invalidate_correction(self, correction: UserCorrection, correction_id: Optional[int]) -> None:
+        """Drop cache entries made stale by a newly stored correction"""
+        self._patterns_cache.pop(correction.project_id, None)
+        if correction_id is not None:
+            self._correction_cache.pop(correction_id, None)
+    
+    def _cache_correction(self, correction: UserCorrection) -> None:
+        """Insert a correction into the LRU cache, evicting the oldest entry"""
+        self._correction_cache[correction.id] = correction
+        self._correction_cache.move_to_end(correction.id)
+        while len(self._correction_cache) > self._correction_cache_size:
+            self._correction_cache.popitem(last=False)
+    
     def _row_to_correction(self, row) -> Optional[UserCorrection]:
         """Convert database row to UserCorrection object"""
         try:
@@ -347,16 +722,21 @@ class CorrectionManager:
                 correction_type=CorrectionType(row[6]),
                 feedback_score=FeedbackScore(row[7]) if row[7] is not None else None,
                 correction_reason=row[8],
-                context=json.loads(row[9]) if row[9] else {},
+                context=_loads_obj(row[9]),
                 timestamp=row[10],
                 applied=row[11],
                 confidence=row[12],
-                metadata=json.loads(row[13]) if row[13] else {}
+                metadata=_loads_obj(row[13])
             )
         except Exception as e:
             logger.error(f"Error converting row to correction: {e}")
             return None
     
+    @staticmethod
+    def _row_to_correction_lite(row) -> CorrectionLite:
+        """Wrap a database row as a CorrectionLite without decoding it"""
+        return CorrectionLite._make(row)
+    
     def _row_to_correction_pattern(self, row) -> Optional[CorrectionPattern]:
         """Convert database row to CorrectionPattern object"""
         try:
@@ -364,14 +744,14 @@ class CorrectionManager:
                 id=row[0],
                 project_id=row[1],
                 pattern_type=CorrectionPatternType(row[2]),
-                pattern_data=json.loads(row[3]) if row[3] else {},
-                source_corrections=json.loads(row[4]) if row[4] else [],
+                pattern_data=_loads_obj(row[3]),
+                source_corrections=_loads_arr(row[4]),
                 confidence=row[5],
                 usage_count=row[6],
                 success_rate=row[7],
                 created_at=row[8],
                 last_applied=row[9],
-                metadata=json.loads(row[10]) if row[10] else {}
+                metadata=_loads_obj(row[10])
             )
         except Exception as e:
             logger.error(f"Error converting row to correction pattern: {e}")
@@ -3,10 +3,34 @@ Correction Learning Types
 Data structures for user corrections and learning patterns.
 """
 
+import json
 import time
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, NamedTuple
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; to_json falls back to the json module
+    orjson = None
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode enums by value for JSON serialization"""
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _to_json(obj: Any) -> bytes:
+    """Serialize a dataclass instance straight to JSON bytes.
+
+    orjson walks the dataclass fields in C without building an intermediate
+    dict; the fallback goes through to_dict. Both produce the same document.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj.to_dict(), default=_json_default).encode()
 
 
 class CorrectionType(Enum):
@@ -37,7 +61,7 @@ class CorrectionPatternType(Enum):
     FILTERING = "filtering"                 # Filter condition preferences
 
 
-@dataclass
+@dataclass(slots=True)
 class UserCorrection:
     """Represents a user correction to an AI-generated query"""
     id: Optional[int] = None
@@ -74,6 +98,10 @@ class UserCorrection:
             'metadata': self.metadata
         }
     
+    def to_json(self) -> bytes:
+        """Serialize to JSON bytes, matching json.dumps(self.to_dict())"""
+        return _to_json(self)
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'UserCorrection':
         """Create from dictionary"""
@@ -95,7 +123,29 @@ class UserCorrection:
         )
 
 
-@dataclass
+class CorrectionLite(NamedTuple):
+    """Undecoded user correction row for analytics paths.
+    
+    Enum fields keep their stored values and JSON columns are left as
+    unparsed strings; decode to UserCorrection only when those fields are read.
+    """
+    id: int
+    session_id: str
+    query_id: str
+    project_id: str
+    original_query: str
+    corrected_query: Optional[str]
+    correction_type: str
+    feedback_score: Optional[int]
+    correction_reason: str
+    context: Optional[str]
+    timestamp: float
+    applied: int
+    confidence: float
+    metadata: Optional[str]
+
+
+@dataclass(slots=True)
 class CorrectionFeedback:
     """User feedback on AI responses"""
     query_id: str
@@ -108,7 +158,7 @@ class CorrectionFeedback:
     metadata: Dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class CorrectionPattern:
     """A learned pattern from user corrections"""
     id: Optional[int] = None
@@ -138,9 +188,13 @@ class CorrectionPattern:
             'last_applied': self.last_applied,
             'metadata': self.metadata
         }
+    
+    def to_json(self) -> bytes:
+        """Serialize to JSON bytes, matching json.dumps(self.to_dict())"""
+        return _to_json(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionLearning:
     """Session-specific learning cache"""
     id: Optional[int] = None
@@ -170,7 +224,7 @@ class SessionLearning:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class CorrectionAnalysis:
     """Analysis results from a correction"""
     correction_id: int
@@ -182,7 +236,7 @@ class CorrectionAnalysis:
     analysis_metadata: Dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class LearningImpact:
     """Impact measurement of correction-based learning"""
     session_id: str
@@ -196,7 +250,7 @@ class LearningImpact:
     timestamp: float = field(default_factory=time.time)
 
 
-@dataclass
+@dataclass(slots=True)
 class CorrectionStats:
     """Statistics about correction learning"""
     total_corrections: int = 0
@@ -7,6 +7,7 @@ from .manager import LocalLLMManager
 from .models import LocalModel, ModelConfig, ModelStatus
 from .downloader import ModelDownloader, DownloadProgress
 from .inference import LocalInferenceEngine
+from .scheduler import RequestScheduler
 from .security import ModelSecurityValidator
 from .hardware import HardwareDetector
 
@@ -18,6 +19,7 @@ __all__ = [
     'ModelDownloader',
     'DownloadProgress',
     'LocalInferenceEngine',
+    'RequestScheduler',
     'ModelSecurityValidator',
     'HardwareDetector'
 ]
@@ -6,18 +6,19 @@ Handles downloading and verification of local LLM models.
 import asyncio
 import aiohttp
 import logging
+import os
 import time
 from pathlib import Path
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Tuple
 from dataclasses import dataclass
 
 from .models import ModelConfig, ModelStatus
-from .security import ModelSecurityValidator
+from .security import BLAKE3_AVAILABLE, ModelSecurityValidator, new_hasher
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class DownloadProgress:
     """Progress information for model downloads"""
     model_name: str
@@ -38,6 +39,206 @@ class DownloadProgress:
         return self.error_message is not None
 
 
+_INV_MB = 1.0 / (1024 * 1024)
+
+
+class _ProgressTracker:
+    """Accumulates downloaded bytes from one or more streams into a DownloadProgress
+    
+    Progress, speed and ETA are only recomputed when the (throttled) callback
+    is due. The read size adapts to the measured bandwidth about once a second.
+    The clock itself is only consulted every CHECK_EVERY_CHUNKS chunks or once
+    a few chunks' worth of bytes has arrived, whichever comes first.
+    """
+    
+    FAST_BYTES_PER_SECOND = 50 * 1024 * 1024  # 50MB/s
+    SLOW_BYTES_PER_SECOND = 1024 * 1024  # 1MB/s
+    FAST_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
+    SLOW_CHUNK_SIZE = 64 * 1024  # 64KB
+    CHECK_EVERY_CHUNKS = 64
+    CHECK_EVERY_CHUNK_SIZES = 4
+    
+    def __init__(self, progress: DownloadProgress,
+                 progress_callback: Optional[Callable[[DownloadProgress], None]],
+                 chunk_size: int, initial_bytes: int = 0):
+        self.progress = progress
+        self.progress_callback = progress_callback
+        self.base_chunk_size = chunk_size
+        self.chunk_size = chunk_size
+        # Bytes kept from earlier attempts count towards progress, not speed
+        self.initial_bytes = initial_bytes
+        self.downloaded_bytes = initial_bytes
+        self.start_time = time.monotonic()
+        self.last_update_time = self.start_time
+        self.last_sample_time = self.start_time
+        self.last_sample_bytes = initial_bytes
+        self.chunks_since_check = 0
+        self.last_checked_bytes = initial_bytes
+    
+    def add(self, byte_count: int):
+        """Record downloaded bytes, refreshing progress when an update is due"""
+        self.downloaded_bytes += byte_count
+        self.chunks_since_check += 1
+        if (self.chunks_since_check < self.CHECK_EVERY_CHUNKS and
+                self.downloaded_bytes - self.last_checked_bytes <= self.CHECK_EVERY_CHUNK_SIZES * self.chunk_size):
+            return
+        self.chunks_since_check = 0
+        self.last_checked_bytes = self.downloaded_bytes
+        
+        current_time = time.monotonic()
+        if (current_time - self.last_update_time) > 0.5:
+            self._adapt_chunk_size(current_time)
+            self.refresh(current_time)
+            
+            # Call progress callback (throttled to avoid spam)
+            if self.progress_callback:
+                self.progress_callback(self.progress)
+            self.last_update_time = current_time
+    
+    def refresh(self, current_time: Optional[float] = None):
+        """Recompute progress, speed and ETA from the bytes seen so far"""
+        if current_time is None:
+            current_time = time.monotonic()
+        progress = self.progress
+        
+        # Update progress
+        progress.downloaded_mb = self.downloaded_bytes * _INV_MB
+        
+        if progress.total_size_mb > 0:
+            progress.progress_percent = (progress.downloaded_mb / progress.total_size_mb) * 100
+        
+        # Calculate speed and ETA
+        elapsed_time = current_time - self.start_time
+        if elapsed_time > 0:
+            progress.download_speed_mbps = (self.downloaded_bytes - self.initial_bytes) * _INV_MB / elapsed_time
+            
+            if progress.download_speed_mbps > 0:
+                remaining_mb = progress.total_size_mb - progress.downloaded_mb
+                progress.eta_seconds = remaining_mb / progress.download_speed_mbps
+    
+    def _adapt_chunk_size(self, current_time: float):
+        """Pick a larger read size on fast links and a smaller one on slow links"""
+        elapsed_time = current_time - self.last_sample_time
+        if elapsed_time < 1.0:
+            return
+        
+        rate = (self.downloaded_bytes - self.last_sample_bytes) / elapsed_time
+        if rate > self.FAST_BYTES_PER_SECOND:
+            self.chunk_size = max(self.base_chunk_size, self.FAST_CHUNK_SIZE)
+        elif rate < self.SLOW_BYTES_PER_SECOND:
+            self.chunk_size = min(self.base_chunk_size, self.SLOW_CHUNK_SIZE)
+        else:
+            self.chunk_size = self.base_chunk_size
+        
+        self.last_sample_time = current_time
+        self.last_sample_bytes = self.downloaded_bytes
+
+
+# Downloads write straight to a file descriptor rather than through a
+# buffered file object; O_BINARY only exists (and matters) on Windows
+_WRITE_FLAGS = os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+
+
+def _write_all(fd: int, data: bytes):
+    """Write data to fd, continuing after short writes without copying"""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _preallocate(path: Path, size: int):
+    """Empty path and reserve size bytes for it
+    
+    posix_fallocate reserves real blocks up front, so the download neither
+    fragments the file nor extends it (a metadata update) chunk by chunk.
+    Where it is unavailable or unsupported by the filesystem, the file is
+    just extended to size so ranges can be written at any offset.
+    """
+    fd = os.open(path, _WRITE_FLAGS | os.O_TRUNC)
+    try:
+        if size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return
+            except OSError:
+                pass
+        os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def _sync_file(path: Path):
+    """Flush a finished download to disk once, before it is verified and moved"""
+    fd = os.open(path, _WRITE_FLAGS)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _parse_content_range_total(content_range: Optional[str]) -> Optional[int]:
+    """Total size from a 'bytes start-end/total' Content-Range header"""
+    if not content_range or '/' not in content_range:
+        return None
+    total = content_range.rsplit('/', 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+@dataclass
+class _Segment:
+    """A byte range of the temp file and how much of it has been written"""
+    start: int
+    end: Optional[int] = None  # Inclusive; None when the length is unknown
+    written: int = 0
+    
+    @property
+    def next_offset(self) -> int:
+        return self.start + self.written
+    
+    @property
+    def remaining(self) -> Optional[int]:
+        return None if self.end is None else self.end + 1 - self.next_offset
+
+
+def _verification_checksum(config: ModelConfig) -> Tuple[str, str]:
+    """The (algorithm, expected hex digest) to verify a model file with"""
+    if config.checksum_blake3 and BLAKE3_AVAILABLE:
+        return 'blake3', config.checksum_blake3
+    return 'sha256', config.checksum_sha256
+
+
+class _ResumeState:
+    """What earlier attempts of one download left in its temp file
+    
+    For a ranged download the segments are the ranges being fetched. For a
+    sequential download there is one open-ended segment, plus the hash of
+    the bytes written so far so hashing can continue where it stopped.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """Forget earlier attempts, as when the server restarts the body"""
+        self.ranged = False
+        self.segments: List[_Segment] = []
+        self.hasher = None
+    
+    @property
+    def written_bytes(self) -> int:
+        return sum(segment.written for segment in self.segments)
+    
+    def can_resume(self) -> bool:
+        return self.written_bytes > 0 or (self.ranged and bool(self.segments))
+
+
+def _split_ranges(total_bytes: int, parts: int) -> List[Tuple[int, int]]:
+    """Split [0, total_bytes) into contiguous inclusive byte ranges"""
+    step = -(-total_bytes // parts)
+    return [(start, min(start + step, total_bytes) - 1) for start in range(0, total_bytes, step)]
+
+
 class ModelDownloader:
     """Secure model downloader with progress tracking"""
     
@@ -48,10 +249,23 @@ class ModelDownloader:
         self.active_downloads: Dict[str, DownloadProgress] = {}
         
         # Download configuration
-        self.chunk_size = 8192  # 8KB chunks
+        self.chunk_size = 1024 * 1024  # 1MB chunks, adapted to bandwidth while downloading
         self.timeout_seconds = 300  # 5 minutes
         self.max_retries = 3
         
+        # Parallel range downloads: files at least this large are fetched over
+        # up to max_connections concurrent Range requests when the server
+        # supports them
+        self.max_connections = 8
+        self.parallel_min_bytes = 32 * 1024 * 1024  # 32MB
+        self.min_range_bytes = 8 * 1024 * 1024  # 8MB per connection at least
+        
+        # HTTP session shared by all downloads so pooled connections and TLS
+        # sessions are reused, including across back-to-back downloads;
+        # created lazily inside the running event loop and kept until close()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        
     async def download_model(self, config: ModelConfig, 
                            progress_callback: Optional[Callable[[DownloadProgress], None]] = None) -> bool:
         """Download and verify a model"""
@@ -84,30 +298,23 @@ class ModelDownloader:
                 # Download with enhanced retry logic
                 success = False
                 last_error = None
+                actual_checksum = None
+                
+                # Retries keep the partial temp file and resume from it
+                resume_state = _ResumeState()
 
                 for attempt in range(self.max_retries):
                     try:
-                        # Clean up partial download before retry
-                        if attempt > 0 and temp_file.exists():
-                            temp_file.unlink()
-                            temp_file = self.security_validator.create_secure_temp_file(
-                                suffix=f"_{config.filename}"
-                            )
-
-                        # Reset progress for retry
                         if attempt > 0:
-                            progress.downloaded_mb = 0.0
-                            progress.progress_percent = 0.0
                             progress.status = f"retrying (attempt {attempt + 1})"
                             if progress_callback:
                                 progress_callback(progress)
 
-                        success = await self._download_with_progress(
-                            config, temp_file, progress, progress_callback
+                        actual_checksum = await self._download_with_progress(
+                            config, temp_file, progress, progress_callback, resume_state
                         )
-
-                        if success:
-                            break
+                        success = True
+                        break
 
                     except aiohttp.ClientError as e:
                         last_error = e
@@ -140,14 +347,18 @@ class ModelDownloader:
                 if not success:
                     raise RuntimeError("Download failed after all retries")
                 
+                _sync_file(temp_file)
+                
                 # Verify downloaded file
                 logger.info(f"🔍 Verifying {config.display_name}...")
                 progress.status = "verifying"
                 if progress_callback:
                     progress_callback(progress)
                 
+                algorithm, expected_checksum = _verification_checksum(config)
                 validation_result = self.security_validator.validate_model_file(
-                    temp_file, config.checksum_sha256
+                    temp_file, expected_checksum, actual_checksum=actual_checksum,
+                    algorithm=algorithm
                 )
                 
                 if not validation_result['valid']:
@@ -200,62 +411,301 @@ class ModelDownloader:
     
     async def _download_with_progress(self, config: ModelConfig, temp_file: Path,
                                     progress: DownloadProgress,
-                                    progress_callback: Optional[Callable[[DownloadProgress], None]]) -> bool:
-        """Download file with progress tracking"""
-        start_time = time.time()
-        last_update_time = start_time
+                                    progress_callback: Optional[Callable[[DownloadProgress], None]],
+                                    resume_state: Optional[_ResumeState] = None) -> str:
+        """Download file with progress tracking, returning its hex digest under
+        the algorithm the model will be verified with
+        
+        The first request asks for 'bytes=0-'. A server without range support
+        answers 200 with the whole body, which is streamed as before. A 206
+        reveals the total size; large files are then split into ranges that
+        are fetched concurrently, each written at its own offset.
         
-        timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
+        When resume_state records bytes written by an earlier attempt, only
+        the missing ranges are requested ('bytes=N-' for a sequential
+        download); a server answering 200 instead restarts the download.
         
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(config.download_url) as response:
+        Sequential downloads are hashed as the bytes arrive. Ranges arrive out
+        of order, so a parallel download is hashed in one pass once complete.
+        """
+        if resume_state is None:
+            resume_state = _ResumeState()
+        algorithm, _ = _verification_checksum(config)
+        
+        tracker = _ProgressTracker(progress, progress_callback, self.chunk_size,
+                                   initial_bytes=resume_state.written_bytes)
+        session = self._get_session()
+        url = config.download_url
+        
+        if resume_state.can_resume():
+            if resume_state.ranged:
+                logger.info(f"Resuming {len(resume_state.segments)} ranges at {resume_state.written_bytes} bytes")
+                await self._download_segments(session, url, temp_file,
+                                              resume_state.segments, tracker)
+                tracker.refresh()
+                return await asyncio.to_thread(self.security_validator.calculate_file_checksum, temp_file, algorithm)
+            
+            segment = resume_state.segments[0]
+            headers = {'Range': f'bytes={segment.next_offset}-'}
+            async with session.get(url, headers=headers) as response:
+                if (response.status == 206 and
+                        (response.headers.get('content-range') or '').startswith(f'bytes {segment.next_offset}-')):
+                    logger.info(f"Resuming download at {segment.next_offset} bytes")
+                    progress.status = "downloading"
+                    await self._write_segment(response, temp_file, segment, tracker, resume_state.hasher)
+                    tracker.refresh()
+                    return resume_state.hasher.hexdigest()
+                
                 if response.status != 200:
                     raise RuntimeError(f"HTTP {response.status}: {response.reason}")
                 
-                # Get actual file size from headers
-                content_length = response.headers.get('content-length')
-                if content_length:
-                    actual_size_mb = int(content_length) / (1024 * 1024)
-                    progress.total_size_mb = actual_size_mb
-                
-                progress.status = "downloading"
+                # The server ignored the range; start over from this response
+                logger.info("Server does not support resuming, restarting download")
+                resume_state.reset()
+                tracker = _ProgressTracker(progress, progress_callback, self.chunk_size)
+                digest = await self._stream_response(response, temp_file, progress, tracker, resume_state, algorithm)
+                tracker.refresh()
+                return digest
+        
+        async with session.get(url, headers={'Range': 'bytes=0-'}) as response:
+            if response.status == 200:
+                digest = await self._stream_response(response, temp_file, progress, tracker, resume_state, algorithm)
+                tracker.refresh()
+                return digest
+            
+            if response.status == 416:
+                # Some servers reject any range on an empty file
+                async with session.get(url) as plain_response:
+                    if plain_response.status != 200:
+                        raise RuntimeError(f"HTTP {plain_response.status}: {plain_response.reason}")
+                    digest = await self._stream_response(plain_response, temp_file, progress, tracker, resume_state, algorithm)
+                tracker.refresh()
+                return digest
+            
+            if response.status != 206:
+                raise RuntimeError(f"HTTP {response.status}: {response.reason}")
+            
+            total_bytes = _parse_content_range_total(response.headers.get('content-range'))
+            if total_bytes is None:
+                raise RuntimeError("Range response without a total size")
+            
+            progress.total_size_mb = total_bytes * _INV_MB
+            progress.status = "downloading"
+            
+            # Size the file up front so every range can write at its offset
+            _preallocate(temp_file, total_bytes)
+            
+            parts = 1
+            if total_bytes >= self.parallel_min_bytes:
+                parts = max(1, min(self.max_connections, total_bytes // self.min_range_bytes))
+            ranges = _split_ranges(total_bytes, parts) if total_bytes else []
+            
+            resume_state.ranged = True
+            resume_state.segments = [_Segment(start, end) for start, end in ranges]
+            
+            # The open response already streams from byte 0, so it serves the
+            # first range; the rest get their own requests
+            await self._download_segments(session, url, temp_file, resume_state.segments,
+                                          tracker, first_response=response)
+            tracker.refresh()
+        
+        return await asyncio.to_thread(self.security_validator.calculate_file_checksum, temp_file, algorithm)
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it for the current event loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._discard_session()
+            timeout = aiohttp.ClientTimeout(total=self.timeout_seconds)
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+            self._session_loop = loop
+        return self._session
+    
+    def _discard_session(self):
+        """Release a session created on another event loop
+        
+        It cannot be awaited from this loop, so it is closed on the loop that
+        owns it; if that loop has already closed, so have its connections.
+        """
+        session, old_loop = self._session, self._session_loop
+        self._session = None
+        self._session_loop = None
+        if session is None or session.closed:
+            return
+        
+        if old_loop is not None and not old_loop.is_closed():
+            asyncio.run_coroutine_threadsafe(session.close(), old_loop)
+        else:
+            session.detach()  # Nothing left to close; just mark it closed
+    
+    async def __aenter__(self) -> "ModelDownloader":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        session, self._session = self._session, None
+        self._session_loop = None
+        if session is not None and not session.closed:
+            await session.close()
+    
+    async def _stream_response(self, response: aiohttp.ClientResponse, temp_file: Path,
+                               progress: DownloadProgress, tracker: _ProgressTracker,
+                               resume_state: _ResumeState, algorithm: str = 'sha256') -> str:
+        """Write a complete (200) response body to temp_file sequentially, returning its digest"""
+        # Get actual file size from headers
+        content_length = response.headers.get('content-length')
+        if content_length:
+            progress.total_size_mb = int(content_length) * _INV_MB
+        
+        progress.status = "downloading"
+        segment = _Segment(0, int(content_length) - 1 if content_length else None)
+        resume_state.segments = [segment]
+        resume_state.hasher = new_hasher(algorithm)
+        
+        # Discard anything an earlier attempt left behind and reserve the
+        # full size when the server announced it
+        _preallocate(temp_file, int(content_length) if content_length else 0)
+        await self._write_segment(response, temp_file, segment, tracker, resume_state.hasher)
+        
+        return resume_state.hasher.hexdigest()
+    
+    async def _download_segments(self, session: aiohttp.ClientSession, url: str, temp_file: Path,
+                                 segments: List[_Segment], tracker: _ProgressTracker,
+                                 first_response: Optional[aiohttp.ClientResponse] = None):
+        """Fetch the unwritten part of every segment concurrently
+        
+        first_response, when given, is an open response streaming from byte 0
+        and serves the first segment.
+        """
+        tasks = [asyncio.create_task(self._download_range(
+            session, url, temp_file, segment, tracker,
+            response=first_response if index == 0 else None
+        )) for index, segment in enumerate(segments) if segment.remaining]
+        
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    
+    async def _download_range(self, session: aiohttp.ClientSession, url: str, temp_file: Path,
+                              segment: _Segment, tracker: _ProgressTracker,
+                              response: Optional[aiohttp.ClientResponse] = None):
+        """Download the unwritten part of segment into temp_file at its offset"""
+        if response is None:
+            start, end = segment.next_offset, segment.end
+            async with session.get(url, headers={'Range': f'bytes={start}-{end}'}) as range_response:
+                if (range_response.status != 206 or not
+                        (range_response.headers.get('content-range') or '').startswith(f'bytes {start}-')):
+                    raise RuntimeError(f"Range request for bytes {start}-{end} failed: HTTP {range_response.status}")
+                await self._write_segment(range_response, temp_file, segment, tracker)
+        else:
+            await self._write_segment(response, temp_file, segment, tracker)
+    
+    async def _write_segment(self, response: aiohttp.ClientResponse, temp_file: Path,
+                             segment: _Segment, tracker: _ProgressTracker, hasher=None):
+        """Stream a response body into temp_file from the segment's next offset
+        
+        A body that ends before the segment does is an error: the rest of the
+        preallocated file is still zero-filled, so it must be retried (and
+        resumed) rather than hashed.
+        """
+        # Each segment writes through its own descriptor, so concurrent ranges
+        # never share a file position
+        fd = os.open(temp_file, _WRITE_FLAGS)
+        try:
+            os.lseek(fd, segment.next_offset, os.SEEK_SET)
+            await self._copy_to_fd(response.content, fd, tracker, segment, hasher=hasher)
+        finally:
+            os.close(fd)
+        
+        if segment.remaining:
+            raise RuntimeError(f"Bytes {segment.start}-{segment.end} ended {segment.remaining} bytes early")
+    
+    async def _copy_to_fd(self, content: aiohttp.StreamReader, fd: int, tracker: _ProgressTracker,
+                          segment: _Segment, hasher=None):
+        """Copy a response body to fd through one reused buffer, up to the segment's end
+        
+        readany() hands over aiohttp's buffered chunks without joining or
+        slicing them; they are gathered into a preallocated buffer so each
+        write, hash update and progress update covers a full chunk_size.
+        segment.written only counts bytes that reached the file, so a failed
+        attempt can resume exactly where it stopped.
+        """
+        # Bound methods and counters live in locals: this loop runs once per
+        # network chunk, so attribute lookups are its main Python overhead
+        readany = content.readany
+        update = hasher.update if hasher is not None else None
+        add = tracker.add
+        remaining = segment.remaining
+        buffer = bytearray(tracker.chunk_size)
+        view = memoryview(buffer)
+        size = len(buffer)
+        filled = 0
+        
+        while remaining is None or remaining > 0:
+            data = await readany()
+            if not data:
+                break
+            
+            length = len(data)
+            if remaining is not None:
+                if length > remaining:
+                    data = memoryview(data)[:remaining]
+                    length = remaining
+                remaining -= length
+            
+            # Common case: the chunk fits in the buffer without filling it
+            end = filled + length
+            if end < size:
+                view[filled:end] = data
+                filled = end
+                continue
+            
+            chunk = memoryview(data)
+            while chunk:
+                take = min(size - filled, len(chunk))
+                view[filled:filled + take] = chunk[:take]
+                chunk = chunk[take:]
+                filled += take
                 
-                with open(temp_file, 'wb') as f:
-                    downloaded_bytes = 0
+                if filled == size:
+                    _write_all(fd, view)
+                    if update is not None:
+                        update(view)
+                    segment.written += filled
+                    add(filled)
+                    filled = 0
                     
-                    async for chunk in response.content.iter_chunked(self.chunk_size):
-                        f.write(chunk)
-                        downloaded_bytes += len(chunk)
-                        
-                        # Update progress
-                        current_time = time.time()
-                        progress.downloaded_mb = downloaded_bytes / (1024 * 1024)
-                        
-                        if progress.total_size_mb > 0:
-                            progress.progress_percent = (progress.downloaded_mb / progress.total_size_mb) * 100
-                        
-                        # Calculate speed and ETA
-                        elapsed_time = current_time - start_time
-                        if elapsed_time > 0:
-                            progress.download_speed_mbps = progress.downloaded_mb / elapsed_time
-                            
-                            if progress.download_speed_mbps > 0:
-                                remaining_mb = progress.total_size_mb - progress.downloaded_mb
-                                progress.eta_seconds = remaining_mb / progress.download_speed_mbps
-                        
-                        # Call progress callback (throttled to avoid spam)
-                        if progress_callback and (current_time - last_update_time) > 0.5:
-                            progress_callback(progress)
-                            last_update_time = current_time
-                
-                return True
+                    # Follow the tracker's bandwidth-adapted chunk size
+                    if tracker.chunk_size != size:
+                        buffer = bytearray(tracker.chunk_size)
+                        view = memoryview(buffer)
+                        size = len(buffer)
+        
+        if filled:
+            _write_all(fd, view[:filled])
+            if update is not None:
+                update(view[:filled])
+            segment.written += filled
+            add(filled)
     
     def get_download_progress(self, model_name: str) -> Optional[DownloadProgress]:
         """Get current download progress for a model"""
         return self.active_downloads.get(model_name)
     
-    def is_model_downloaded(self, config: ModelConfig) -> bool:
-        """Check if model is already downloaded"""
+    def is_model_downloaded(self, config: ModelConfig, direct_io: bool = False) -> bool:
+        """Check if model is already downloaded
+        
+        With direct_io the file is hashed without going through the page
+        cache, for checks that are not followed by loading the model.
+        """
         model_path = self.models_dir / config.filename
         
         if not model_path.exists():
@@ -263,8 +713,14 @@ class ModelDownloader:
         
         # Verify checksum of existing file
         try:
+            algorithm, expected_checksum = _verification_checksum(config)
+            actual_checksum = None
+            if direct_io:
+                actual_checksum = self.security_validator.calculate_file_checksum_direct(
+                    model_path, algorithm
+                )
             return self.security_validator.verify_checksum(
-                model_path, config.checksum_sha256
+                model_path, expected_checksum, algorithm, actual_checksum=actual_checksum
             )
         except Exception as e:
             logger.warning(f"Error verifying existing model {config.name}: {e}")
@@ -298,10 +754,17 @@ class ModelDownloader:
     def get_models_directory_size(self) -> float:
         """Get total size of models directory in MB"""
         try:
+            # scandir entries carry the file type from the directory listing,
+            # so only regular files cost a stat call
             total_size = 0
-            for file_path in self.models_dir.rglob('*'):
-                if file_path.is_file():
-                    total_size += file_path.stat().st_size
+            pending = [self.models_dir]
+            while pending:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file():
+                            total_size += entry.stat().st_size
             
             return total_size / (1024 * 1024)  # Convert to MB
             
@@ -314,14 +777,19 @@ class ModelDownloader:
         cleaned_count = 0
         
         try:
-            # Look for temporary files that might be left over
-            for temp_file in self.models_dir.glob('tmp*'):
-                try:
-                    temp_file.unlink()
-                    cleaned_count += 1
-                    logger.info(f"Cleaned up temporary file: {temp_file}")
-                except Exception as e:
-                    logger.warning(f"Failed to cleanup {temp_file}: {e}")
+            # Look for temporary files that might be left over; the directory
+            # listing already says which entries are directories, so those
+            # are skipped without a failing unlink call
+            with os.scandir(self.models_dir) as entries:
+                for entry in entries:
+                    if not entry.name.startswith('tmp') or entry.is_dir(follow_symlinks=False):
+                        continue
+                    try:
+                        os.unlink(entry.path)
+                        cleaned_count += 1
+                        logger.info(f"Cleaned up temporary file: {entry.path}")
+                    except Exception as e:
+                        logger.warning(f"Failed to cleanup {entry.path}: {e}")
             
             return cleaned_count
             
@@ -0,0 +1,156 @@
+"""
+GGUF Metadata Reader
+Reads layer counts and tensor sizes from GGUF model headers without loading weights.
+"""
+
+import logging
+import re
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+GGUF_MAGIC = b"GGUF"
+DEFAULT_ALIGNMENT = 32
+
+# GGUF metadata value types -> struct format for the fixed-size ones
+_SCALAR_FORMATS = {
+    0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i",
+    6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d",
+}
+_STRING_TYPE = 8
+_ARRAY_TYPE = 9
+
+_BLOCK_TENSOR_RE = re.compile(r"blk\.(\d+)\.")
+
+
+@dataclass(slots=True)
+class GGUFModelInfo:
+    """Shape and size information needed to plan GPU offloading"""
+    architecture: str
+    n_layer: int
+    n_head: int
+    n_head_kv: int
+    n_embd: int
+    context_length: int
+    file_size: int
+    layer_bytes: int           # Average weight bytes of one repeating block
+    non_repeating_bytes: int   # Embeddings, output norm and head
+
+    @property
+    def head_dim(self) -> int:
+        return self.n_embd // self.n_head if self.n_head else 0
+
+    def kv_cache_bytes_per_layer(self, n_ctx: int, bytes_per_element: float = 2.0) -> int:
+        """K and V cache for one layer at ``n_ctx`` tokens (f16 by default)"""
+        return int(n_ctx * self.n_head_kv * self.head_dim * 2 * bytes_per_element)
+
+
+def _read(f: BinaryIO, fmt: str):
+    size = struct.calcsize(fmt)
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated GGUF header")
+    return struct.unpack(fmt, data)[0]
+
+
+def _read_string(f: BinaryIO) -> str:
+    length = _read(f, "<Q")
+    data = f.read(length)
+    if len(data) != length:
+        raise ValueError("Truncated GGUF header")
+    return data.decode("utf-8", errors="replace")
+
+
+def _read_value(f: BinaryIO, value_type: int, keep: bool) -> Any:
+    """Read one metadata value; arrays are skipped unless ``keep`` is set"""
+    fmt = _SCALAR_FORMATS.get(value_type)
+    if fmt is not None:
+        return _read(f, fmt)
+    if value_type == _STRING_TYPE:
+        return _read_string(f)
+    if value_type == _ARRAY_TYPE:
+        item_type = _read(f, "<I")
+        count = _read(f, "<Q")
+        item_format = _SCALAR_FORMATS.get(item_type)
+        if item_format is not None and not keep:
+            # Fixed-size items: skip the whole array in one seek
+            f.seek(struct.calcsize(item_format) * count, 1)
+            return None
+        items = [_read_value(f, item_type, keep) for _ in range(count)]
+        return items if keep else None
+    raise ValueError(f"Unknown GGUF value type {value_type}")
+
+
+def read_gguf_metadata(path: Path) -> Optional[GGUFModelInfo]:
+    """Read model dimensions and per-layer weight sizes from a GGUF file.
+
+    Returns None if the file is not GGUF (v2 or later) or lacks the fields
+    needed for offload planning.
+    """
+    path = Path(path)
+    try:
+        file_size = path.stat().st_size
+        with open(path, "rb") as f:
+            if f.read(4) != GGUF_MAGIC:
+                return None
+            version = _read(f, "<I")
+            if version < 2:
+                return None  # v1 used 32-bit counts and is long obsolete
+            tensor_count = _read(f, "<Q")
+            kv_count = _read(f, "<Q")
+
+            metadata: Dict[str, Any] = {}
+            for _ in range(kv_count):
+                key = _read_string(f)
+                value_type = _read(f, "<I")
+                metadata[key] = _read_value(f, value_type, keep=False)
+
+            tensors = []
+            for _ in range(tensor_count):
+                name = _read_string(f)
+                n_dims = _read(f, "<I")
+                f.seek(8 * n_dims + 4, 1)  # Dimensions and ggml type
+                tensors.append((_read(f, "<Q"), name))
+
+            alignment = metadata.get("general.alignment") or DEFAULT_ALIGNMENT
+            header_end = f.tell()
+            data_start = header_end + (-header_end % alignment)
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"Could not read GGUF header from {path}: {e}")
+        return None
+
+    architecture = metadata.get("general.architecture")
+    n_layer = metadata.get(f"{architecture}.block_count")
+    n_head = metadata.get(f"{architecture}.attention.head_count")
+    n_embd = metadata.get(f"{architecture}.embedding_length")
+    if not (architecture and n_layer and n_head and n_embd and tensors):
+        return None
+
+    # Tensor data is laid out by offset, so each tensor's size (with its
+    # alignment padding) is the distance to the next one
+    tensors.sort()
+    data_size = file_size - data_start
+    repeating_bytes = 0
+    non_repeating_bytes = 0
+    for index, (offset, name) in enumerate(tensors):
+        next_offset = tensors[index + 1][0] if index + 1 < len(tensors) else data_size
+        size = max(0, next_offset - offset)
+        if _BLOCK_TENSOR_RE.match(name):
+            repeating_bytes += size
+        else:
+            non_repeating_bytes += size
+
+    return GGUFModelInfo(
+        architecture=architecture,
+        n_layer=int(n_layer),
+        n_head=int(n_head),
+        n_head_kv=int(metadata.get(f"{architecture}.attention.head_count_kv") or n_head),
+        n_embd=int(n_embd),
+        context_length=int(metadata.get(f"{architecture}.context_length") or 0),
+        file_size=file_size,
+        layer_bytes=repeating_bytes // int(n_layer),
+        non_repeating_bytes=non_repeating_bytes,
+    )
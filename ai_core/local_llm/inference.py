@@ -4,20 +4,48 @@ Handles loading and running inference with local models.
 """
 
 import asyncio
+import gc
+import importlib.util
 import logging
+import mmap
+import psutil
+import sys
 import time
-import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, Any, Optional, List, AsyncGenerator
+from typing import Dict, Any, Optional, List, AsyncGenerator, Tuple
 from dataclasses import dataclass
+from uuid import uuid4
 
 from .models import LocalModel, ModelConfig, ModelStatus
 from .hardware import HardwareDetector
+from .gguf_metadata import GGUFModelInfo, read_gguf_metadata
+from .scheduler import AdaptiveConcurrency, BatchLoop, DeadlineExceeded, RequestScheduler
 
 logger = logging.getLogger(__name__)
 
+_torch = None
 
-@dataclass
+# KV cache element types: name -> (ggml type id for type_k/type_v, bytes per element)
+KV_CACHE_TYPES = {
+    'f16': (1, 2.0),
+    'q8_0': (8, 34 / 32),
+    'q4_0': (2, 18 / 32),
+}
+
+
+def _import_torch():
+    """Import torch once; deferred because llama.cpp-only setups never need it"""
+    global _torch
+    if _torch is None:
+        import torch
+        _torch = torch
+    return _torch
+
+
+@dataclass(slots=True)
 class InferenceRequest:
     """Request for model inference"""
     prompt: str
@@ -27,17 +55,19 @@ class InferenceRequest:
     stop_sequences: List[str] = None
     stream: bool = False
     request_id: str = ""
+    tenant_id: str = "default"
+    priority: int = 0  # Lower values are served first
+    deadline_ts: Optional[float] = None  # time.time() after which the result is useless
     
     def __post_init__(self):
         if self.stop_sequences is None:
             self.stop_sequences = []
         
         if not self.request_id:
-            import uuid
-            self.request_id = str(uuid.uuid4())
+            self.request_id = uuid4().hex
 
 
-@dataclass
+@dataclass(slots=True)
 class InferenceResponse:
     """Response from model inference"""
     text: str
@@ -59,19 +89,44 @@ class LocalInferenceEngine:
     
     def __init__(self, models_dir: Path):
         self.models_dir = Path(models_dir)
-        self.hardware_detector = HardwareDetector()
+        self.hardware_detector = HardwareDetector(self.models_dir / ".hw_cache.json")
         
         # Model management
         self.loaded_models: Dict[str, LocalModel] = {}
-        self.model_locks: Dict[str, threading.Lock] = {}
+        
+        # Hot-path views of loaded_models, kept in step by _record_model_state
+        self._available: Dict[str, bool] = {}
+        self._memory_mb: Dict[str, float] = {}
+        self._gpu_memory_mb: Dict[str, float] = {}
+        self._total_memory_mb = 0.0
+        self._total_gpu_memory_mb = 0.0
+        self._loaded_names: Tuple[str, ...] = ()
+        self._stats_snapshots: Dict[str, Dict[str, Any]] = {}
+        self.batch_loops: Dict[str, BatchLoop] = {}
+        self._stream_queues: Dict[str, asyncio.Queue] = {}
+        self._completion_fns: Dict[str, partial] = {}
+        self._finalizers: Dict[str, weakref.finalize] = {}
         
         # Performance settings
         self.max_concurrent_requests = 3
         self.model_timeout_seconds = 30
         self.inference_timeout_seconds = 60
+        self.max_batch_size = 8
+        self.batch_wait_ms = 10
+        
+        # Hardware-derived load settings, computed on first load
+        self.optimal_threads: Optional[int] = None
+        self.gpu_memory_mb: Optional[int] = None
+        self.gpu_scratch_mb = 384  # Compute/scratch buffers llama.cpp keeps in VRAM
         
-        # Request queue
-        self.request_semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        # Loads run one at a time on a dedicated thread so they never
+        # compete with inference for the default executor
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+        self._torch_available = importlib.util.find_spec("torch") is not None
+        
+        # Request queue, fair across tenants
+        self.scheduler = RequestScheduler(self.max_concurrent_requests)
+        self.concurrency = AdaptiveConcurrency(self.scheduler, has_headroom=self._has_gpu_headroom)
         
     async def load_model(self, config: ModelConfig) -> bool:
         """Load a model into memory"""
@@ -87,7 +142,11 @@ class LocalInferenceEngine:
             # Create model instance
             model = LocalModel(config=config, status=ModelStatus.LOADING)
             self.loaded_models[config.name] = model
-            self.model_locks[config.name] = threading.Lock()
+            self._record_model_state(model)
+            self._completion_fns.pop(config.name, None)
+            stale_loop = self.batch_loops.pop(config.name, None)
+            if stale_loop is not None:
+                await stale_loop.close()
             
             # Check if model file exists
             model_path = self.models_dir / config.filename
@@ -100,13 +159,25 @@ class LocalInferenceEngine:
             success = await self._load_model_implementation(model)
             
             if success:
+                # Tells unload whether dropping our references freed the weights.
+                # Some native handles can't be weakly referenced; unload then
+                # always falls back to a full collection.
+                try:
+                    self._finalizers[config.name] = weakref.finalize(
+                        model.model_instance, logger.debug, f"Released weights of {config.name}"
+                    )
+                except TypeError:
+                    self._finalizers.pop(config.name, None)
+                self.batch_loops[config.name] = self._create_batch_loop(model)
                 model.status = ModelStatus.LOADED
                 model.loaded_at = time.time()
+                self._record_model_state(model)
                 logger.info(f"✅ Successfully loaded {config.display_name}")
                 return True
             else:
                 model.status = ModelStatus.ERROR
                 model.error_message = "Failed to load model implementation"
+                self._record_model_state(model)
                 return False
                 
         except Exception as e:
@@ -114,13 +185,60 @@ class LocalInferenceEngine:
             if config.name in self.loaded_models:
                 self.loaded_models[config.name].status = ModelStatus.ERROR
                 self.loaded_models[config.name].error_message = str(e)
+                self._record_model_state(self.loaded_models[config.name])
             return False
     
+    def _create_batch_loop(self, model: LocalModel) -> BatchLoop:
+        """Create the task that owns a loaded model, sized for its backend"""
+        if model.tokenizer_instance is not None:
+            # transformers decodes a whole batch in one padded generate()
+            max_batch_size, max_wait_ms = self.max_batch_size, self.batch_wait_ms
+        else:
+            # llama.cpp decodes one sequence at a time; batching would only
+            # hold finished results back until the rest of the batch is done
+            max_batch_size, max_wait_ms = 1, 0
+        return BatchLoop(
+            lambda batch, model=model: self._generate_batch(model, batch),
+            batch_key=self._batch_key,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+    
+    def _record_model_state(self, model: LocalModel):
+        """Mirror a model's availability and memory into the hot-path tables"""
+        name = model.config.name
+        self._forget_model_state(name)
+        
+        self._available[name] = model.is_available
+        self._memory_mb[name] = model.memory_usage_mb
+        self._gpu_memory_mb[name] = model.gpu_memory_usage_mb
+        self._total_memory_mb += model.memory_usage_mb
+        self._total_gpu_memory_mb += model.gpu_memory_usage_mb
+        self._stats_snapshots[name] = model.to_dict()
+        self._refresh_loaded_names()
+    
+    def _forget_model_state(self, name: str):
+        """Drop a model from the hot-path tables"""
+        self._available.pop(name, None)
+        self._total_memory_mb -= self._memory_mb.pop(name, 0.0)
+        self._total_gpu_memory_mb -= self._gpu_memory_mb.pop(name, 0.0)
+        self._stats_snapshots.pop(name, None)
+        if not self._memory_mb:
+            # Don't let float drift accumulate across load/unload cycles
+            self._total_memory_mb = 0.0
+            self._total_gpu_memory_mb = 0.0
+        self._refresh_loaded_names()
+    
+    def _refresh_loaded_names(self):
+        self._loaded_names = tuple(name for name, available in self._available.items() if available)
+    
     async def _load_model_implementation(self, model: LocalModel) -> bool:
         """Load the actual model implementation"""
         try:
             # Detect hardware capabilities
-            hardware = self.hardware_detector.get_hardware_capabilities()
+            hardware = await self.hardware_detector.get_hardware_capabilities_async()
+            if self.optimal_threads is None:
+                self._init_hardware_settings(hardware)
             
             # Choose implementation based on model architecture and hardware
             if model.config.architecture == "llama":
@@ -147,9 +265,21 @@ class LocalInferenceEngine:
                 logger.error("llama-cpp-python not installed. Install with: pip install llama-cpp-python")
                 return False
 
+            gguf_info: Optional[GGUFModelInfo] = await asyncio.to_thread(read_gguf_metadata, model.local_path)
+            model_size_mb = model.local_path.stat().st_size / (1024 * 1024)
+
+            # Quantize the KV cache when memory is tight; q8_0 halves it at
+            # negligible quality cost
+            cache_type = 'f16'
+            if hardware.available_memory_mb < model.config.memory_requirement_mb * 2:
+                cache_type = 'q8_0'
+            kv_type_id, kv_bytes_per_element = KV_CACHE_TYPES[cache_type]
+
             # Optimize parameters based on hardware capabilities
-            optimal_threads = self._calculate_optimal_threads(hardware)
-            optimal_context = self._calculate_optimal_context(model.config, hardware)
+            optimal_threads = self.optimal_threads
+            optimal_context = self._calculate_optimal_context(
+                model.config, hardware, gguf_info, model_size_mb, kv_bytes_per_element
+            )
 
             # Configure model parameters with performance optimizations
             model_params = {
@@ -162,12 +292,30 @@ class LocalInferenceEngine:
                 'use_mmap': True,   # Use memory mapping for efficiency
             }
 
+            if cache_type != 'f16':
+                model_params['type_k'] = kv_type_id
+                model_params['type_v'] = kv_type_id
+                model_params['flash_attn'] = True  # llama.cpp requires it for a quantized V cache
+                logger.info(f"🔧 Using {cache_type} KV cache")
+
+            # Locking more than fits comfortably in RAM pushes everything else into swap
+            if hardware.available_memory_mb <= model_size_mb * 1.2:
+                model_params['use_mlock'] = False
+
             # Advanced GPU optimization
             if hardware.has_gpu and hardware.cuda_available:
                 # Calculate optimal GPU layers based on VRAM
-                gpu_memory_mb = sum(gpu.memory_mb for gpu in hardware.gpus if gpu.is_available)
-                if gpu_memory_mb > 0:
-                    # Estimate layers that fit in GPU memory
+                gpu_memory_mb = self.gpu_memory_mb
+                if gguf_info and gpu_memory_mb > 0:
+                    # Size layers from the model's own tensors and KV cache
+                    max_gpu_layers = self._calculate_gpu_layers(
+                        gguf_info, gpu_memory_mb, optimal_context, kv_bytes_per_element
+                    )
+                    model_params['n_gpu_layers'] = max_gpu_layers
+                    offloaded = "all" if max_gpu_layers < 0 else max_gpu_layers
+                    logger.info(f"🚀 Using GPU acceleration with {offloaded} of {gguf_info.n_layer} layers")
+                elif gpu_memory_mb > 0:
+                    # Not GGUF: estimate layers that fit in GPU memory
                     estimated_layer_memory = model.config.memory_requirement_mb / 32  # Rough estimate
                     max_gpu_layers = min(32, int(gpu_memory_mb * 0.8 / estimated_layer_memory))
                     model_params['n_gpu_layers'] = max_gpu_layers
@@ -176,6 +324,15 @@ class LocalInferenceEngine:
                     model_params['n_gpu_layers'] = -1  # Use all layers
                     logger.info("🚀 Using GPU acceleration (all layers)")
 
+                # With most layers on the GPU, a mapping would keep their weights
+                # resident in the page cache as well; read them straight to VRAM
+                n_layer = gguf_info.n_layer if gguf_info else 32
+                n_gpu_layers = model_params['n_gpu_layers']
+                if n_gpu_layers < 0 or n_gpu_layers >= n_layer * 0.5:
+                    model_params['use_mmap'] = False
+                    model_params['use_mlock'] = False
+                    logger.info("🔧 Loading without mmap (weights mostly on GPU)")
+
             # Memory optimization
             if hardware.available_memory_mb < model.config.memory_requirement_mb * 1.5:
                 # Low memory mode
@@ -190,10 +347,10 @@ class LocalInferenceEngine:
             start_time = time.time()
 
             # Load model in thread pool with timeout
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             try:
                 model_instance = await asyncio.wait_for(
-                    loop.run_in_executor(None, lambda: Llama(**model_params)),
+                    loop.run_in_executor(self._loader, lambda: Llama(**model_params)),
                     timeout=self.model_timeout_seconds
                 )
             except asyncio.TimeoutError:
@@ -208,6 +365,11 @@ class LocalInferenceEngine:
             # Accurate memory usage calculation
             model.memory_usage_mb = self._calculate_actual_memory_usage(model.config, hardware)
 
+            # Fault the mapped weights in up front so the warmup and first
+            # request run at RAM speed instead of waiting on disk
+            if model_params['use_mmap'] and model_size_mb < hardware.available_memory_mb:
+                await loop.run_in_executor(self._loader, self._prefault_model_file, model.local_path)
+
             # Warm up the model with a small inference
             try:
                 await self._warmup_model(model)
@@ -231,22 +393,41 @@ class LocalInferenceEngine:
             # Try transformers first for Phi models
             try:
                 from transformers import AutoModelForCausalLM, AutoTokenizer
-                import torch
-                
-                # Load tokenizer
-                tokenizer = AutoTokenizer.from_pretrained("microsoft/phi-2")
+                torch = _import_torch()
                 
-                # Load model with appropriate device
                 device = "cuda" if hardware.cuda_available else "cpu"
-                torch_model = AutoModelForCausalLM.from_pretrained(
-                    "microsoft/phi-2",
-                    torch_dtype=torch.float16 if device == "cuda" else torch.float32,
-                    device_map="auto" if device == "cuda" else None
-                )
+                
+                def load():
+                    # Tokenizer stays on the CPU; it holds no device tensors
+                    tokenizer = AutoTokenizer.from_pretrained("microsoft/phi-2")
+                    if tokenizer.pad_token is None:
+                        tokenizer.pad_token = tokenizer.eos_token
+                    tokenizer.padding_side = "left"  # Batched prompts end flush against generated tokens
+                    
+                    # Stream weights into place instead of staging a full CPU copy first
+                    torch_model = AutoModelForCausalLM.from_pretrained(
+                        "microsoft/phi-2",
+                        torch_dtype=torch.float16 if device == "cuda" else torch.float32,
+                        device_map="auto" if device == "cuda" else None,
+                        low_cpu_mem_usage=True
+                    )
+                    torch_model.eval()
+                    
+                    if device == "cuda":
+                        # Hand load-time staging blocks back to the driver before
+                        # the first decode allocates its KV cache
+                        torch.cuda.synchronize()
+                        torch.cuda.empty_cache()
+                    return torch_model, tokenizer
+                
+                loop = asyncio.get_running_loop()
+                torch_model, tokenizer = await loop.run_in_executor(self._loader, load)
                 
                 model.model_instance = torch_model
                 model.tokenizer_instance = tokenizer
                 model.memory_usage_mb = self._estimate_memory_usage(model.config)
+                if device == "cuda":
+                    model.gpu_memory_usage_mb = torch_model.get_memory_footprint() / (1024 * 1024)
                 
                 return True
                 
@@ -276,7 +457,8 @@ class LocalInferenceEngine:
         
         try:
             # Check if model is loaded
-            if model_name not in self.loaded_models:
+            available = self._available.get(model_name)
+            if available is None:
                 return InferenceResponse(
                     text="",
                     request_id=request.request_id,
@@ -289,7 +471,7 @@ class LocalInferenceEngine:
             
             model = self.loaded_models[model_name]
             
-            if not model.is_available:
+            if not available:
                 return InferenceResponse(
                     text="",
                     request_id=request.request_id,
@@ -300,19 +482,31 @@ class LocalInferenceEngine:
                     error=f"Model {model_name} not available: {model.error_message}"
                 )
             
-            # Acquire semaphore for concurrent request limiting
-            async with self.request_semaphore:
-                # Acquire model lock
-                with self.model_locks[model_name]:
-                    # Generate response
-                    response = await self._generate_with_model(request, model)
-                    
-                    # Update model statistics
-                    inference_time = time.time() - start_time
-                    model.update_usage_stats(inference_time)
-                    
-                    return response
+            # Wait for a fair-share slot; the model's batch loop serializes access
+            response = await self.scheduler.submit(
+                lambda: self._generate_with_model(request, model),
+                tenant_id=request.tenant_id, priority=request.priority,
+                deadline=self._request_deadline(request, start_time)
+            )
+            
+            # Update model statistics
+            inference_time = time.time() - start_time
+            model.update_usage_stats(inference_time)
+            self.concurrency.record(response.inference_time, response.tokens_generated)
+            
+            return response
                     
+        except DeadlineExceeded as e:
+            return InferenceResponse(
+                text="",
+                request_id=request.request_id,
+                model_name=model_name,
+                inference_time=time.time() - start_time,
+                tokens_generated=0,
+                tokens_per_second=0.0,
+                finish_reason="deadline_exceeded",
+                error=str(e)
+            )
         except asyncio.TimeoutError:
             return InferenceResponse(
                 text="",
@@ -325,6 +519,8 @@ class LocalInferenceEngine:
             )
         except Exception as e:
             logger.error(f"Error during inference: {e}")
+            if "out of memory" in str(e).lower():
+                self.concurrency.record_oom()
             return InferenceResponse(
                 text="",
                 request_id=request.request_id,
@@ -335,23 +531,55 @@ class LocalInferenceEngine:
                 error=str(e)
             )
     
+    async def generate_stream(self, request: InferenceRequest, model_name: str) -> AsyncGenerator[str, None]:
+        """Generate text using specified model, yielding chunks as they are produced"""
+        if not self._available.get(model_name):
+            raise ValueError(f"Model {model_name} not available")
+        
+        model = self.loaded_models[model_name]
+        start_time = time.time()
+        request.stream = True
+        queue: asyncio.Queue = asyncio.Queue()
+        self._stream_queues[request.request_id] = queue
+        
+        # Same fair-share slot and batch loop as generate(); chunks arrive on the queue
+        task = asyncio.create_task(self.scheduler.submit(
+            lambda: self._generate_with_model(request, model),
+            tenant_id=request.tenant_id, priority=request.priority,
+            deadline=self._request_deadline(request, start_time)
+        ))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+            
+            await task  # Surface generation errors
+            model.update_usage_stats(time.time() - start_time)
+        finally:
+            # Also tells the worker thread to stop if the caller went away
+            self._stream_queues.pop(request.request_id, None)
+            if not task.done():
+                task.cancel()
+    
+    def _request_deadline(self, request: InferenceRequest, arrival: float) -> float:
+        """Deadline for dispatching a request, defaulting to the inference timeout"""
+        if request.deadline_ts is not None:
+            return request.deadline_ts
+        return arrival + self.inference_timeout_seconds
+    
     async def _generate_with_model(self, request: InferenceRequest, model: LocalModel) -> InferenceResponse:
         """Generate text with specific model implementation"""
         start_time = time.time()
         
         try:
-            # Handle different model implementations
-            if hasattr(model.model_instance, '__call__'):
-                # llama.cpp style
-                result = await self._generate_llama_cpp(request, model)
-            elif hasattr(model.model_instance, 'generate'):
-                # transformers style
-                result = await self._generate_transformers(request, model)
-            else:
-                raise ValueError(f"Unknown model implementation type")
+            # Join the next batch for this model
+            result, tokens_generated = await self.batch_loops[model.config.name].submit(request)
             
             inference_time = time.time() - start_time
-            tokens_generated = len(result.split())  # Rough token count
             tokens_per_second = tokens_generated / inference_time if inference_time > 0 else 0
             
             return InferenceResponse(
@@ -367,53 +595,111 @@ class LocalInferenceEngine:
             logger.error(f"Error in model generation: {e}")
             raise
     
-    async def _generate_llama_cpp(self, request: InferenceRequest, model: LocalModel) -> str:
-        """Generate using llama.cpp"""
-        loop = asyncio.get_event_loop()
+    @staticmethod
+    def _batch_key(request: InferenceRequest):
+        """Requests may share a batch only if they sample identically"""
+        return (request.max_tokens, request.temperature, request.top_p, tuple(request.stop_sequences))
+    
+    async def _generate_batch(self, model: LocalModel, batch: List[InferenceRequest]) -> List[Tuple[str, int]]:
+        """Run a batch of requests against a model in a single executor hop"""
+        if model.tokenizer_instance is not None:
+            # transformers style
+            run = self._run_transformers_batch
+        elif callable(model.model_instance):
+            # llama.cpp style
+            run = self._run_llama_cpp_batch
+        else:
+            raise ValueError(f"Unknown model implementation type")
         
-        # Run inference in thread pool
-        result = await loop.run_in_executor(
-            None,
-            lambda: model.model_instance(
-                request.prompt,
-                max_tokens=request.max_tokens,
-                temperature=request.temperature,
-                top_p=request.top_p,
-                stop=request.stop_sequences,
-                echo=False
-            )
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, run, model, batch, loop)
+        
+        if run is self._run_transformers_batch:
+            # No incremental output from a batched generate(); stream it whole
+            for request, (text, _) in zip(batch, results):
+                queue = self._stream_queues.get(request.request_id)
+                if queue is not None:
+                    queue.put_nowait(text)
+        
+        return results
+    
+    def _run_llama_cpp_batch(self, model: LocalModel, batch: List[InferenceRequest],
+                             loop: asyncio.AbstractEventLoop) -> List[Tuple[str, int]]:
+        """Generate using llama.cpp, returning (text, completion tokens) pairs"""
+        # A Llama instance decodes one sequence at a time, so its batch loop
+        # hands over single requests (see _create_batch_loop).
+        create_completion = self._completion_fns.get(model.config.name)
+        if create_completion is None:
+            # Bound once per model: skips Llama.__call__ re-forwarding ~20 kwargs
+            create_completion = partial(model.model_instance.create_completion, echo=False)
+            self._completion_fns[model.config.name] = create_completion
+        
+        # Every request in a batch samples identically (see _batch_key)
+        first = batch[0]
+        complete = partial(
+            create_completion,
+            max_tokens=first.max_tokens,
+            temperature=first.temperature,
+            top_p=first.top_p,
+            stop=first.stop_sequences
         )
         
-        return result['choices'][0]['text']
+        stream_queues = self._stream_queues
+        results = []
+        for request in batch:
+            queue = stream_queues.get(request.request_id)
+            if queue is None:
+                result = complete(request.prompt)
+                results.append((result['choices'][0]['text'], result['usage']['completion_tokens']))
+                continue
+            
+            # Forward tokens to the caller as llama.cpp produces them
+            pieces = []
+            put = queue.put_nowait
+            call_soon = loop.call_soon_threadsafe
+            for chunk in complete(request.prompt, stream=True):
+                text = chunk['choices'][0]['text']
+                pieces.append(text)
+                call_soon(put, text)
+                if request.request_id not in stream_queues:
+                    break  # Caller stopped reading
+            # Each streamed chunk carries one sampled token
+            results.append((''.join(pieces), len(pieces)))
+        return results
     
-    async def _generate_transformers(self, request: InferenceRequest, model: LocalModel) -> str:
-        """Generate using transformers"""
-        import torch
+    def _run_transformers_batch(self, model: LocalModel, batch: List[InferenceRequest],
+                                loop: asyncio.AbstractEventLoop) -> List[Tuple[str, int]]:
+        """Generate using transformers, one padded forward pass for the whole batch"""
+        torch = _import_torch()
         
         tokenizer = model.tokenizer_instance
         model_instance = model.model_instance
         
-        # Tokenize input
-        inputs = tokenizer.encode(request.prompt, return_tensors="pt")
+        # Tokenize input, copying it to the model's device ahead of generate()
+        inputs = tokenizer([request.prompt for request in batch], return_tensors="pt", padding=True)
+        device = model_instance.device
+        if device.type == "cuda":
+            inputs = {key: value.pin_memory().to(device, non_blocking=True) for key, value in inputs.items()}
         
-        # Generate
-        loop = asyncio.get_event_loop()
-        with torch.no_grad():
-            outputs = await loop.run_in_executor(
-                None,
-                lambda: model_instance.generate(
-                    inputs,
-                    max_new_tokens=request.max_tokens,
-                    temperature=request.temperature,
-                    top_p=request.top_p,
-                    do_sample=True,
-                    pad_token_id=tokenizer.eos_token_id
-                )
+        # Generate (batch members share sampling settings, see _batch_key)
+        first = batch[0]
+        with torch.inference_mode():
+            outputs = model_instance.generate(
+                **inputs,
+                max_new_tokens=first.max_tokens,
+                temperature=first.temperature,
+                top_p=first.top_p,
+                do_sample=True,
+                pad_token_id=tokenizer.pad_token_id
             )
         
-        # Decode response
-        response = tokenizer.decode(outputs[0][inputs.shape[1]:], skip_special_tokens=True)
-        return response
+        # Decode the whole batch at once, still on this worker thread
+        new_tokens = outputs[:, inputs['input_ids'].shape[1]:]
+        texts = tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        
+        # Rows that stopped early are padded out to the longest one
+        token_counts = (new_tokens != tokenizer.pad_token_id).sum(dim=1).tolist()
+        return list(zip(texts, token_counts))
     
     async def unload_model(self, model_name: str) -> bool:
         """Unload a model from memory with enhanced cleanup"""
@@ -428,26 +714,13 @@ class LocalInferenceEngine:
             # Record memory usage before cleanup
             initial_memory = model.memory_usage_mb
 
-            # Clear CUDA cache if using GPU
-            try:
-                import torch
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
-                    torch.cuda.synchronize()
-                    logger.info("🧹 Cleared CUDA cache")
-            except ImportError:
-                pass  # PyTorch not available
-            except Exception as e:
-                logger.warning(f"Failed to clear CUDA cache: {e}")
+            # Stop feeding the model new batches
+            batch_loop = self.batch_loops.pop(model_name, None)
+            if batch_loop is not None:
+                await batch_loop.close()
 
-            # Explicitly delete model components
-            if hasattr(model.model_instance, 'cpu'):
-                try:
-                    model.model_instance.cpu()  # Move to CPU before deletion
-                except Exception:
-                    pass
-
-            # Clear references
+            # Clear references; the bound completion function holds one too
+            self._completion_fns.pop(model_name, None)
             model.model_instance = None
             model.tokenizer_instance = None
 
@@ -458,31 +731,32 @@ class LocalInferenceEngine:
 
             # Remove from loaded models
             del self.loaded_models[model_name]
-            if model_name in self.model_locks:
-                del self.model_locks[model_name]
-
-            # Aggressive garbage collection
-            import gc
-            gc.collect()
-            gc.collect()  # Run twice for better cleanup
-            gc.collect()  # Third time for stubborn references
-
-            # Additional cleanup for specific libraries
-            try:
-                import torch
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
-                    # Force memory cleanup
-                    for i in range(torch.cuda.device_count()):
-                        with torch.cuda.device(i):
-                            torch.cuda.empty_cache()
-            except ImportError:
-                pass
-            except Exception as e:
-                logger.warning(f"Additional CUDA cleanup failed: {e}")
+            self._forget_model_state(model_name)
+
+            # Refcounting normally frees the weights right here. Only pay for a
+            # full collection if a reference cycle is still keeping them alive
+            # (or if the instance couldn't be tracked at all)
+            finalizer = self._finalizers.pop(model_name, None)
+            if finalizer is None:
+                gc.collect()
+            elif finalizer.alive:
+                gc.collect()
+                if finalizer.alive:
+                    logger.warning(f"Model {model_name} is still referenced after unload")
+
+            # Only an imported torch can be holding cached CUDA blocks
+            if self._torch_available and 'torch' in sys.modules:
+                try:
+                    torch = sys.modules['torch']
+                    if torch.cuda.is_available():
+                        torch.cuda.synchronize()
+                        torch.cuda.empty_cache()  # Releases every device's cache
+                        torch.cuda.ipc_collect()
+                        logger.info("🧹 Cleared CUDA cache")
+                except Exception as e:
+                    logger.warning(f"Failed to clear CUDA cache: {e}")
 
             # Verify memory was actually freed
-            import psutil
             process = psutil.Process()
             current_memory = process.memory_info().rss / (1024 * 1024)  # MB
 
@@ -497,26 +771,77 @@ class LocalInferenceEngine:
     
     def get_loaded_models(self) -> List[str]:
         """Get list of currently loaded models"""
-        return [name for name, model in self.loaded_models.items() if model.is_available]
+        return list(self._loaded_names)
     
     def get_model_stats(self, model_name: str) -> Optional[Dict[str, Any]]:
         """Get statistics for a loaded model"""
-        if model_name not in self.loaded_models:
+        snapshot = self._stats_snapshots.get(model_name)
+        if snapshot is None:
             return None
         
-        return self.loaded_models[model_name].to_dict()
+        # Everything but the usage counters only changes with the load state
+        model = self.loaded_models[model_name]
+        stats = dict(snapshot)
+        stats['inference_count'] = model.inference_count
+        stats['average_inference_time'] = model.average_inference_time
+        stats['last_used'] = model.last_used
+        return stats
+    
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """Get request scheduler queue depth, wait-time and batching statistics"""
+        stats = self.scheduler.get_stats()
+        stats['ewma_seconds_per_token'] = self.concurrency.ewma_seconds_per_token
+        stats['avg_batch_size'] = {
+            name: batch_loop.avg_batch_size for name, batch_loop in self.batch_loops.items()
+        }
+        return stats
     
     def get_memory_usage(self) -> Dict[str, float]:
         """Get total memory usage of loaded models"""
-        total_memory = sum(model.memory_usage_mb for model in self.loaded_models.values())
-        total_gpu_memory = sum(model.gpu_memory_usage_mb for model in self.loaded_models.values())
-        
         return {
-            'total_memory_mb': total_memory,
-            'total_gpu_memory_mb': total_gpu_memory,
+            'total_memory_mb': self._total_memory_mb,
+            'total_gpu_memory_mb': self._total_gpu_memory_mb,
             'loaded_models': len(self.loaded_models)
         }
 
+    def _has_gpu_headroom(self) -> bool:
+        """Whether the GPU has room for more concurrent work (True without torch/CUDA)"""
+        if not (self._torch_available and 'torch' in sys.modules):
+            return True
+        try:
+            torch = sys.modules['torch']
+            if not torch.cuda.is_available():
+                return True
+            free, total = torch.cuda.mem_get_info()
+            return free > max(self.gpu_scratch_mb * 1024 * 1024, total * 0.1)
+        except Exception:
+            return True
+    
+    def _init_hardware_settings(self, hardware):
+        """Compute the load settings that depend only on the hardware"""
+        self.optimal_threads = self._calculate_optimal_threads(hardware)
+        self.gpu_memory_mb = sum(gpu.memory_mb for gpu in hardware.gpus if gpu.is_available)
+    
+    def refresh_hardware(self):
+        """Re-detect hardware before the next model load"""
+        self.hardware_detector.refresh()
+        self.optimal_threads = None
+        self.gpu_memory_mb = None
+    
+    def _calculate_gpu_layers(self, info: GGUFModelInfo, gpu_memory_mb: int, n_ctx: int,
+                              kv_bytes_per_element: float = 2.0) -> int:
+        """Calculate how many layers fit in VRAM, or -1 if the whole model does"""
+        budget = (gpu_memory_mb - self.gpu_scratch_mb) * 1024 * 1024
+        
+        # An offloaded layer brings its weights and its slice of the KV cache
+        per_layer = info.layer_bytes + info.kv_cache_bytes_per_layer(n_ctx, kv_bytes_per_element)
+        if budget <= 0 or per_layer <= 0:
+            return 0
+        
+        if budget >= per_layer * info.n_layer + info.non_repeating_bytes:
+            return -1
+        return min(info.n_layer, int(budget // per_layer))
+    
     def _calculate_optimal_threads(self, hardware) -> int:
         """Calculate optimal number of threads for model inference"""
         # Use 75% of available cores, but cap at 16 for diminishing returns
@@ -530,12 +855,20 @@ class LocalInferenceEngine:
 
         return optimal
 
-    def _calculate_optimal_context(self, config, hardware) -> int:
+    def _calculate_optimal_context(self, config, hardware, gguf_info: Optional[GGUFModelInfo] = None,
+                                   model_size_mb: float = 0.0, kv_bytes_per_element: float = 2.0) -> int:
         """Calculate optimal context length based on hardware"""
         max_context = min(config.context_length, hardware.max_context_length)
 
-        # Reduce context if memory is limited
-        if hardware.available_memory_mb < config.memory_requirement_mb * 1.2:
+        if gguf_info:
+            # Fit the KV cache into the memory the weights leave free
+            kv_bytes_per_token = (gguf_info.n_layer * gguf_info.n_head_kv * gguf_info.head_dim
+                                  * 2 * kv_bytes_per_element)
+            kv_budget = (hardware.available_memory_mb - model_size_mb) * 1024 * 1024
+            if kv_bytes_per_token > 0:
+                fitting_context = int(kv_budget // kv_bytes_per_token) // 256 * 256
+                max_context = min(max_context, fitting_context)
+        elif hardware.available_memory_mb < config.memory_requirement_mb * 1.2:
             # Reduce context by 25% if memory is tight
             max_context = int(max_context * 0.75)
 
@@ -556,15 +889,33 @@ class LocalInferenceEngine:
 
         return base_memory + context_overhead
 
+    @staticmethod
+    def _prefault_model_file(path: Path):
+        """Pull a model file into the page cache shared with llama.cpp's mapping"""
+        try:
+            with open(path, 'rb') as f:
+                if hasattr(mmap, 'MADV_WILLNEED'):
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        mapped.madvise(mmap.MADV_WILLNEED)
+                    return
+                
+                # No madvise (Windows): one sequential read warms the cache as well
+                buffer = bytearray(8 * 1024 * 1024)
+                while f.readinto(buffer):
+                    pass
+        except (OSError, ValueError) as e:
+            logger.debug(f"Could not prefault {path}: {e}")
+    
     async def _warmup_model(self, model: LocalModel):
         """Warm up model with a small inference to optimize performance"""
         try:
-            if hasattr(model.model_instance, '__call__'):
+            model_instance = model.model_instance
+            if callable(model_instance):
                 # llama.cpp style warmup
                 warmup_prompt = "SELECT"
-                await asyncio.get_event_loop().run_in_executor(
+                await asyncio.get_running_loop().run_in_executor(
                     None,
-                    lambda: model.model_instance(
+                    lambda: model_instance(
                         warmup_prompt,
                         max_tokens=1,
                         temperature=0.1,
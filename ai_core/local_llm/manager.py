@@ -6,17 +6,81 @@ Central orchestration for local model management, download, and inference.
 import asyncio
 import logging
 import json
+import os
+import time
+import weakref
 from pathlib import Path
-from typing import Dict, Any, Optional, List, Callable
+from typing import Dict, Any, Optional, List, Callable, Tuple, AsyncGenerator
 
 from .models import LocalModel, ModelConfig, ModelStatus, AVAILABLE_MODELS, get_recommended_model
 from .downloader import ModelDownloader, DownloadProgress
 from .inference import LocalInferenceEngine, InferenceRequest, InferenceResponse
-from .hardware import HardwareDetector
+from .hardware import HardwareCapabilities, HardwareDetector
 from .security import run_security_vulnerability_scan
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; config I/O falls back to the json module
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+CONFIG_IO_BUFFER_SIZE = 64 * 1024
+HARDWARE_POLL_TTL = 10.0  # seconds a status poll reuses the last capabilities
+_DOWNLOADED = ModelStatus.DOWNLOADED
+_LOADED = ModelStatus.LOADED
+
+# The dependency scan only changes when packages do, so one result serves
+# every manager in the process for a while
+SECURITY_SCAN_TTL = 300.0
+_SCAN_CACHE: Optional[Dict[str, Any]] = None
+_SCAN_CACHE_TIME = 0.0
+
+
+class _ConfigState:
+    """Persisted manager settings, shared with the shutdown finalizer"""
+    
+    __slots__ = ('active_model', 'dirty')
+    
+    def __init__(self):
+        self.active_model: Optional[str] = None
+        self.dirty = False
+
+
+def _write_config(config_file: Path, active_model: Optional[str]):
+    """Write config to a temporary sibling and swap it in with os.replace,
+    so a crash mid-write never leaves a torn config behind"""
+    tmp_file = config_file.with_suffix('.json.tmp')
+    try:
+        config = {
+            'active_model': active_model,
+            'last_updated': time.time()
+        }
+        if orjson is not None:
+            payload = orjson.dumps(config, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(config, indent=2).encode('utf-8')
+        
+        with open(tmp_file, 'wb', buffering=CONFIG_IO_BUFFER_SIZE) as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, config_file)
+    except Exception:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
+
+def _flush_if_dirty(config_file: Path, state: _ConfigState):
+    """Finalizer for managers dropped without cleanup(); no I/O unless the
+    active model changed since the last save"""
+    if state.dirty:
+        try:
+            _write_config(config_file, state.active_model)
+            state.dirty = False
+        except Exception:
+            pass  # Ignore errors during shutdown
+
 
 class LocalLLMManager:
     """Central manager for local LLM operations"""
@@ -32,16 +96,29 @@ class LocalLLMManager:
         # Component initialization
         self.downloader = ModelDownloader(self.models_dir)
         self.inference_engine = LocalInferenceEngine(self.models_dir)
-        self.hardware_detector = HardwareDetector()
+        self.hardware_detector = HardwareDetector(self.models_dir / ".hw_cache.json")
+        self._hw_cache: Tuple[float, Optional[HardwareCapabilities]] = (0.0, None)
         
         # State management
         self.available_models = AVAILABLE_MODELS.copy()
+        # The catalogue is fixed for the manager's lifetime; iterate a flat tuple
+        self._models_items = tuple(self.available_models.items())
         self.model_states: Dict[str, LocalModel] = {}
-        self.active_model: Optional[str] = None
+        # Bumped whenever model_states changes so serialized listings can be reused
+        self._state_version = 0
+        # Serializes full refreshes; a refresh queued behind another finds
+        # the files it just verified and only stats them
+        self._state_lock = asyncio.Lock()
+        self._cached_models: Tuple[int, Optional[List[Dict[str, Any]]]] = (-1, None)
+        self._cached_recommendations: Tuple[Optional[HardwareCapabilities], Optional[Dict[str, Any]]] = (None, None)
+        self._config_state = _ConfigState()
         
         # Configuration
         self.config_file = self.models_dir / "config.json"
         self.load_configuration()
+        self._config_finalizer = weakref.finalize(
+            self, _flush_if_dirty, self.config_file, self._config_state
+        )
         
         # Security check status
         self.security_scan_completed = False
@@ -57,6 +134,17 @@ class LocalLLMManager:
 
         logger.info(f"🚀 LocalLLMManager initialized with models directory: {self.models_dir}")
     
+    @property
+    def active_model(self) -> Optional[str]:
+        return self._config_state.active_model
+    
+    @active_model.setter
+    def active_model(self, model_name: Optional[str]):
+        # Only a real transition needs to reach config.json
+        if model_name != self._config_state.active_model:
+            self._config_state.active_model = model_name
+            self._config_state.dirty = True
+    
     async def initialize(self) -> bool:
         """Initialize the LLM manager"""
         try:
@@ -66,7 +154,7 @@ class LocalLLMManager:
             await self.run_security_scan()
             
             # Detect hardware capabilities
-            hardware = self.hardware_detector.get_hardware_capabilities()
+            hardware = await self._hw_async()
             logger.info(f"Hardware detected: {hardware.cpu_count} CPU cores, {hardware.available_memory_mb}MB RAM")
             
             # Initialize model states
@@ -83,13 +171,26 @@ class LocalLLMManager:
             logger.error(f"❌ Failed to initialize Local LLM Manager: {e}")
             return False
     
-    async def run_security_scan(self) -> Dict[str, Any]:
-        """Run mandatory security vulnerability scan"""
+    async def run_security_scan(self, force: bool = False) -> Dict[str, Any]:
+        """Run mandatory security vulnerability scan
+        
+        The scan runs in a worker thread and a completed result is reused for
+        SECURITY_SCAN_TTL seconds across managers unless force is set.
+        """
+        global _SCAN_CACHE, _SCAN_CACHE_TIME
+        
+        now = time.monotonic()
+        if not force and _SCAN_CACHE is not None and now - _SCAN_CACHE_TIME < SECURITY_SCAN_TTL:
+            self.security_scan_results = dict(_SCAN_CACHE)
+            self.security_scan_completed = True
+            return self.security_scan_results
+        
         logger.info("🔒 Running mandatory security vulnerability scan...")
         
         try:
-            self.security_scan_results = run_security_vulnerability_scan()
+            self.security_scan_results = await asyncio.to_thread(run_security_vulnerability_scan)
             self.security_scan_completed = True
+            _SCAN_CACHE, _SCAN_CACHE_TIME = dict(self.security_scan_results), now
             
             if self.security_scan_results['vulnerabilities_found'] > 0:
                 logger.error("❌ CRITICAL: Security vulnerabilities detected!")
@@ -114,38 +215,84 @@ class LocalLLMManager:
     
     async def refresh_model_states(self):
         """Refresh the state of all available models"""
-        for model_name, config in self.available_models.items():
-            if self.downloader.is_model_downloaded(config):
-                if model_name not in self.model_states:
-                    self.model_states[model_name] = LocalModel(
-                        config=config,
-                        status=ModelStatus.DOWNLOADED,
-                        local_path=self.downloader.get_model_path(config)
-                    )
-                else:
-                    self.model_states[model_name].status = ModelStatus.DOWNLOADED
-                    self.model_states[model_name].local_path = self.downloader.get_model_path(config)
-            else:
-                if model_name not in self.model_states:
-                    self.model_states[model_name] = LocalModel(
-                        config=config,
-                        status=ModelStatus.NOT_DOWNLOADED
-                    )
-                else:
-                    self.model_states[model_name].status = ModelStatus.NOT_DOWNLOADED
+        async with self._state_lock:
+            # Verify every downloaded model concurrently on the loop's shared
+            # executor; direct I/O keeps models we are not about to load out
+            # of the page cache
+            signatures = await asyncio.gather(*(
+                self._verify_download(config, direct_io=True)
+                for _, config in self._models_items
+            ))
+            
+            for (_, config), signature in zip(self._models_items, signatures):
+                self._record_download(config, signature)
+    
+    def _record_download(self, config: ModelConfig, signature: Optional[Tuple[int, int]]):
+        """Update one model's state from the result of _verify_download"""
+        state = self.model_states.get(config.name)
+        if state is None:
+            state = self.model_states[config.name] = LocalModel(config=config)
+            self._state_version += 1
+        before = (state.status, state.local_path, state.verified_signature)
+        
+        state.verified_signature = signature
+        if signature is not None:
+            # Already verified; get_model_path would hash the file again
+            state.local_path = self.downloader.models_dir / config.filename
+            if state.status is not _LOADED and state.status is not ModelStatus.LOADING:
+                state.status = ModelStatus.DOWNLOADED
+        else:
+            state.status = ModelStatus.NOT_DOWNLOADED
+        
+        # An unchanged refresh must keep the cached listings warm
+        if (state.status, state.local_path, state.verified_signature) != before:
+            self._state_version += 1
+    
+    def _file_signature(self, config: ModelConfig) -> Optional[Tuple[int, int]]:
+        """(size, mtime_ns) of a model's file, or None if it is missing"""
+        try:
+            stat = os.stat(self.downloader.models_dir / config.filename)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+    
+    async def _verify_download(self, config: ModelConfig,
+                               direct_io: bool = False) -> Optional[Tuple[int, int]]:
+        """Check that a model is downloaded intact, returning its file signature
+        
+        A file whose size and mtime match its last successful verification
+        is not hashed again. Returns None if the file is missing or corrupt.
+        """
+        signature = self._file_signature(config)
+        if signature is None:
+            return None
+        
+        state = self.model_states.get(config.name)
+        if state is not None and state.verified_signature == signature:
+            return signature
+        
+        if await asyncio.to_thread(self.downloader.is_model_downloaded, config, direct_io):
+            return signature
+        return None
+    
+    def _set_status(self, model_name: str, status: ModelStatus):
+        """Update a tracked model's status, invalidating cached listings"""
+        state = self.model_states.get(model_name)
+        if state is not None and state.status is not status:
+            state.status = status
+            self._state_version += 1
     
     async def auto_setup_recommended_model(self) -> bool:
         """Automatically set up the recommended model for current hardware"""
         try:
-            hardware = self.hardware_detector.get_hardware_capabilities()
+            hardware = await self._hw_async()
             recommended_model = get_recommended_model(hardware.available_memory_mb, hardware.has_gpu)
             
             logger.info(f"🎯 Recommended model for your system: {recommended_model}")
             
             # Check if recommended model is already downloaded
-            if recommended_model in self.model_states:
-                model_state = self.model_states[recommended_model]
-                
+            model_state = self.model_states.get(recommended_model)
+            if model_state is not None:
                 if model_state.status == ModelStatus.DOWNLOADED:
                     # Load the model
                     success = await self.load_model(recommended_model)
@@ -173,29 +320,34 @@ class LocalLLMManager:
     async def download_model(self, model_name: str,
                            progress_callback: Optional[Callable[[DownloadProgress], None]] = None) -> bool:
         """Download a model with circuit breaker protection"""
-        if model_name not in self.available_models:
+        config = self.available_models.get(model_name)
+        if config is None:
             logger.error(f"Unknown model: {model_name}")
             return False
 
-        config = self.available_models[model_name]
-
-        # Check if already downloaded
-        if self.downloader.is_model_downloaded(config):
+        # Check if already downloaded; hashing runs off the loop so other
+        # downloads keep streaming meanwhile
+        signature = await self._verify_download(config)
+        if signature is not None:
             logger.info(f"Model {model_name} already downloaded")
-            await self.refresh_model_states()
+            self._record_download(config, signature)
             return True
 
         # Execute with circuit breaker protection
         async def download_operation():
             # Update model state
-            if model_name in self.model_states:
-                self.model_states[model_name].status = ModelStatus.DOWNLOADING
+            self._set_status(model_name, ModelStatus.DOWNLOADING)
 
-            # Download the model
-            success = await self.downloader.download_model(config, progress_callback)
+            # Download the model; only this model's state can have changed,
+            # so update it directly rather than refreshing every model
+            try:
+                success = await self.downloader.download_model(config, progress_callback)
+            except BaseException:
+                self._record_download(config, None)
+                raise
 
-            # Update model state
-            await self.refresh_model_states()
+            # The downloader verified the file before moving it into place
+            self._record_download(config, self._file_signature(config) if success else None)
 
             return success
 
@@ -205,37 +357,58 @@ class LocalLLMManager:
             logger.error(f"Download blocked by circuit breaker: {e}")
             return False
     
+    async def download_models_parallel(self, model_names: List[str],
+                                       max_concurrency: int = 2) -> Dict[str, bool]:
+        """Download several models at once, at most max_concurrency at a time
+        
+        Returns whether each model ended up downloaded.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def download_one(model_name: str) -> bool:
+            async with semaphore:
+                return await self.download_model(model_name)
+        
+        results = await asyncio.gather(
+            *(download_one(model_name) for model_name in model_names),
+            return_exceptions=True
+        )
+        
+        downloaded = {}
+        for model_name, result in zip(model_names, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Error downloading {model_name}: {result}")
+                result = False
+            downloaded[model_name] = result
+        return downloaded
+    
     async def load_model(self, model_name: str) -> bool:
         """Load a model into memory"""
-        if model_name not in self.available_models:
+        config = self.available_models.get(model_name)
+        if config is None:
             logger.error(f"Unknown model: {model_name}")
             return False
         
-        config = self.available_models[model_name]
-        
         # Check if model is downloaded
-        if not self.downloader.is_model_downloaded(config):
+        if await self._verify_download(config) is None:
             logger.error(f"Model {model_name} not downloaded")
             return False
         
         # Update model state
-        if model_name in self.model_states:
-            self.model_states[model_name].status = ModelStatus.LOADING
+        self._set_status(model_name, ModelStatus.LOADING)
         
         # Load the model
         success = await self.inference_engine.load_model(config)
         
         # Update model state
         if success:
-            if model_name in self.model_states:
-                self.model_states[model_name].status = ModelStatus.LOADED
+            self._set_status(model_name, ModelStatus.LOADED)
             
             # Set as active model if none is set
             if not self.active_model:
                 self.active_model = model_name
         else:
-            if model_name in self.model_states:
-                self.model_states[model_name].status = ModelStatus.ERROR
+            self._set_status(model_name, ModelStatus.ERROR)
         
         return success
     
@@ -245,8 +418,7 @@ class LocalLLMManager:
         
         if success:
             # Update model state
-            if model_name in self.model_states:
-                self.model_states[model_name].status = ModelStatus.DOWNLOADED
+            self._set_status(model_name, ModelStatus.DOWNLOADED)
             
             # Clear active model if it was unloaded
             if self.active_model == model_name:
@@ -271,47 +443,86 @@ class LocalLLMManager:
                 error="No model loaded"
             )
         
-        # Create inference request
-        request = InferenceRequest(
+        # Generate response
+        return await self.inference_engine.generate(self._build_request(prompt, kwargs), model_name)
+    
+    async def stream_text(self, prompt: str, model_name: Optional[str] = None,
+                          **kwargs) -> AsyncGenerator[str, None]:
+        """Generate text using a loaded model, yielding chunks as they are produced
+        
+        Takes the same options as generate_text. Raises ValueError if no
+        model is loaded.
+        """
+        if model_name is None:
+            model_name = self.active_model
+        
+        if not model_name:
+            raise ValueError("No model loaded")
+        
+        request = self._build_request(prompt, kwargs)
+        async for chunk in self.inference_engine.generate_stream(request, model_name):
+            yield chunk
+    
+    def _build_request(self, prompt: str, options: Dict[str, Any]) -> InferenceRequest:
+        """Create an inference request from generate_text/stream_text options"""
+        if not options:
+            # The common call: every field takes the request's own default
+            return InferenceRequest(prompt=prompt)
+        return InferenceRequest(
             prompt=prompt,
-            max_tokens=kwargs.get('max_tokens', 512),
-            temperature=kwargs.get('temperature', 0.7),
-            top_p=kwargs.get('top_p', 0.9),
-            stop_sequences=kwargs.get('stop_sequences', [])
+            max_tokens=options.get('max_tokens', 512),
+            temperature=options.get('temperature', 0.7),
+            top_p=options.get('top_p', 0.9),
+            stop_sequences=options.get('stop_sequences', []),
+            tenant_id=options.get('tenant_id', 'default'),
+            priority=options.get('priority', 0),
+            deadline_ts=options.get('deadline_ts')
         )
-        
-        # Generate response
-        return await self.inference_engine.generate(request, model_name)
     
     def get_available_models(self) -> List[Dict[str, Any]]:
         """Get list of available models with their status"""
+        version, models = self._cached_models
+        if version == self._state_version:
+            return [dict(model_info) for model_info in models]
+        
         models = []
         
-        for model_name, config in self.available_models.items():
-            model_info = {
-                'name': model_name,
-                'display_name': config.display_name,
-                'description': config.description,
-                'model_type': config.model_type.value,
-                'file_size_mb': config.file_size_mb,
-                'memory_requirement_mb': config.memory_requirement_mb,
-                'parameter_count': config.parameter_count,
-                'quality_score': config.quality_score,
-                'recommended_for': config.recommended_for,
-                'status': ModelStatus.NOT_DOWNLOADED.value
-            }
+        for model_name, config in self._models_items:
+            model_info = config._info_base.copy()
             
             # Update with actual status if available
-            if model_name in self.model_states:
-                model_info.update(self.model_states[model_name].to_dict())
+            state = self.model_states.get(model_name)
+            if state is not None:
+                model_info.update(state.to_dict())
             
             models.append(model_info)
         
-        return models
+        self._cached_models = (self._state_version, models)
+        return [dict(model_info) for model_info in models]
+    
+    def _hw(self) -> HardwareCapabilities:
+        """Hardware capabilities for status endpoints, reused for a few
+        seconds so UI polling skips the detector entirely"""
+        now = time.time()
+        cached_at, hardware = self._hw_cache
+        if hardware is not None and now - cached_at < HARDWARE_POLL_TTL:
+            return hardware
+        hardware = self.hardware_detector.get_hardware_capabilities()
+        self._hw_cache = (now, hardware)
+        return hardware
+    
+    async def _hw_async(self) -> HardwareCapabilities:
+        """Like _hw, but a stale entry is refreshed off the event loop"""
+        cached_at, hardware = self._hw_cache
+        if hardware is not None and time.time() - cached_at < HARDWARE_POLL_TTL:
+            return hardware
+        hardware = await self.hardware_detector.get_hardware_capabilities_async()
+        self._hw_cache = (time.time(), hardware)
+        return hardware
     
     def get_system_status(self) -> Dict[str, Any]:
         """Get comprehensive system status"""
-        hardware = self.hardware_detector.get_hardware_capabilities()
+        hardware = self._hw()
         memory_usage = self.inference_engine.get_memory_usage()
         loaded_models = self.inference_engine.get_loaded_models()
         
@@ -319,8 +530,8 @@ class LocalLLMManager:
             'active_model': self.active_model,
             'loaded_models': loaded_models,
             'total_models_available': len(self.available_models),
-            'models_downloaded': len([m for m in self.model_states.values() 
-                                   if m.status in [ModelStatus.DOWNLOADED, ModelStatus.LOADED]]),
+            'models_downloaded': sum(1 for m in self.model_states.values()
+                                     if m.status is _DOWNLOADED or m.status is _LOADED),
             'hardware_capabilities': hardware.to_dict(),
             'memory_usage': memory_usage,
             'security_scan_completed': self.security_scan_completed,
@@ -331,7 +542,21 @@ class LocalLLMManager:
     
     def get_model_recommendations(self) -> Dict[str, Any]:
         """Get model recommendations based on current hardware"""
-        hardware = self.hardware_detector.get_hardware_capabilities()
+        hardware = self._hw()
+        # Nothing here depends on model state, so a result holds until the
+        # hardware snapshot is refreshed
+        cached_for, recommendations = self._cached_recommendations
+        if cached_for is not hardware:
+            recommendations = self._build_recommendations(hardware)
+            self._cached_recommendations = (hardware, recommendations)
+        
+        return {
+            'recommended_model': recommendations['recommended_model'],
+            'hardware_summary': dict(recommendations['hardware_summary']),
+            'model_options': [dict(option) for option in recommendations['model_options']]
+        }
+    
+    def _build_recommendations(self, hardware: HardwareCapabilities) -> Dict[str, Any]:
         recommended_model = get_recommended_model(hardware.available_memory_mb, hardware.has_gpu)
         
         return {
@@ -349,7 +574,7 @@ class LocalLLMManager:
                     'suitable': config.memory_requirement_mb <= hardware.available_memory_mb,
                     'performance_estimate': hardware.estimated_inference_speed * config.inference_speed_tokens_per_sec
                 }
-                for name, config in self.available_models.items()
+                for name, config in self._models_items
             ]
         }
     
@@ -357,24 +582,23 @@ class LocalLLMManager:
         """Load configuration from file"""
         try:
             if self.config_file.exists():
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
+                with open(self.config_file, 'rb', buffering=CONFIG_IO_BUFFER_SIZE) as f:
+                    data = f.read()
+                    config = orjson.loads(data) if orjson is not None else json.loads(data)
                     self.active_model = config.get('active_model')
+                    self._config_state.dirty = False
                     logger.info(f"Loaded configuration: active_model={self.active_model}")
         except Exception as e:
             logger.warning(f"Could not load configuration: {e}")
     
     def save_configuration(self):
-        """Save configuration to file"""
+        """Save configuration to file if the active model changed since it
+        was loaded or last saved"""
+        if not self._config_state.dirty:
+            return
         try:
-            config = {
-                'active_model': self.active_model,
-                'last_updated': time.time()
-            }
-            
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=2)
-                
+            _write_config(self.config_file, self.active_model)
+            self._config_state.dirty = False
         except Exception as e:
             logger.error(f"Could not save configuration: {e}")
     
@@ -388,64 +612,63 @@ class LocalLLMManager:
             # Save configuration
             self.save_configuration()
             
+            # Stop the request dispatcher and release pooled download connections
+            await self.inference_engine.scheduler.close()
+            await self.downloader.close()
+            
             logger.info("✅ Local LLM Manager cleanup completed")
             
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
     
-    def __del__(self):
-        """Destructor"""
-        try:
-            # Save configuration on destruction
-            self.save_configuration()
-        except Exception:
-            pass  # Ignore errors during destruction
-
-    def _check_circuit_breaker(self) -> bool:
+    def _check_circuit_breaker(self, now: float) -> bool:
         """Check if circuit breaker allows operation"""
-        current_time = time.time()
-
         # If circuit is open, check if timeout has passed
         if self.circuit_open:
-            if current_time - self.circuit_open_time > self.circuit_timeout:
+            elapsed = now - self.circuit_open_time
+            if elapsed > self.circuit_timeout:
                 # Reset circuit breaker
                 self.circuit_open = False
                 self.failure_count = 0
                 logger.info("🔄 Circuit breaker reset - attempting to resume operations")
                 return True
             else:
-                remaining = self.circuit_timeout - (current_time - self.circuit_open_time)
+                remaining = self.circuit_timeout - elapsed
                 logger.warning(f"⚡ Circuit breaker open - {remaining:.0f}s remaining")
                 return False
 
         return True
 
-    def _record_success(self):
+    def _record_success(self, now: float):
         """Record successful operation"""
         if self.failure_count > 0:
             self.failure_count = max(0, self.failure_count - 1)
-        self.last_operation_time = time.time()
+        self.last_operation_time = now
 
-    def _record_failure(self):
+    def _record_failure(self, now: float):
         """Record failed operation and potentially open circuit breaker"""
         self.failure_count += 1
-        self.last_operation_time = time.time()
+        self.last_operation_time = now
 
-        if self.failure_count >= self.max_failures:
+        if self.failure_count >= self.max_failures and not self.circuit_open:
             self.circuit_open = True
-            self.circuit_open_time = time.time()
+            self.circuit_open_time = now
             logger.error(f"⚡ Circuit breaker opened after {self.failure_count} failures")
 
     async def _execute_with_circuit_breaker(self, operation_name: str, operation_func):
-        """Execute operation with circuit breaker protection"""
-        if not self._check_circuit_breaker():
+        """Execute operation with circuit breaker protection
+        
+        The breaker helpers never await, so each runs atomically on the event
+        loop; a lock held across the operation would only serialize downloads.
+        """
+        if not self._check_circuit_breaker(time.time()):
             raise RuntimeError(f"Circuit breaker open - {operation_name} not available")
 
         try:
             result = await operation_func()
-            self._record_success()
+            self._record_success(time.time())
             return result
         except Exception as e:
-            self._record_failure()
+            self._record_failure(time.time())
             logger.error(f"Operation {operation_name} failed: {e}")
             raise
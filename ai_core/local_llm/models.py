@@ -3,9 +3,11 @@ Local LLM Model Definitions and Configuration
 """
 
 import time
+from bisect import bisect_right
 from enum import Enum
 from dataclasses import dataclass, field
-from typing import Dict, Any, Optional, List
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, List, Tuple
 from pathlib import Path
 
 
@@ -28,9 +30,9 @@ class ModelType(Enum):
     LIGHTWEIGHT = "lightweight"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ModelConfig:
-    """Configuration for a local LLM model"""
+    """Configuration for a local LLM model (immutable; derive variants with dataclasses.replace)"""
     name: str
     display_name: str
     model_type: ModelType
@@ -54,16 +56,35 @@ class ModelConfig:
     training_data_cutoff: str = "2023-09"
     
     # File handling
+    checksum_blake3: Optional[str] = None  # Preferred over SHA-256 when blake3 is installed
     filename: str = ""
     extraction_path: Optional[str] = None
     requires_extraction: bool = False
     
+    # Serialized enum value and catalogue entry, resolved once for status listings
+    _model_type_value: str = field(init=False, repr=False, compare=False)
+    _info_base: Dict[str, Any] = field(init=False, repr=False, compare=False)
+    
     def __post_init__(self):
         if not self.filename:
-            self.filename = self.download_url.split('/')[-1]
-
-
-@dataclass
+            object.__setattr__(self, 'filename', self.download_url.split('/')[-1])
+        object.__setattr__(self, '_model_type_value', self.model_type.value)
+        # Copy before use; model states overlay their own fields on top
+        object.__setattr__(self, '_info_base', {
+            'name': self.name,
+            'display_name': self.display_name,
+            'description': self.description,
+            'model_type': self._model_type_value,
+            'file_size_mb': self.file_size_mb,
+            'memory_requirement_mb': self.memory_requirement_mb,
+            'parameter_count': self.parameter_count,
+            'quality_score': self.quality_score,
+            'recommended_for': self.recommended_for,
+            'status': ModelStatus.NOT_DOWNLOADED.value
+        })
+
+
+@dataclass(slots=True)
 class LocalModel:
     """Represents a local LLM model instance"""
     config: ModelConfig
@@ -72,6 +93,8 @@ class LocalModel:
     loaded_at: Optional[float] = None
     last_used: Optional[float] = None
     error_message: Optional[str] = None
+    # (size, mtime_ns) of the file when its checksum last verified
+    verified_signature: Optional[Tuple[int, int]] = None
     
     # Runtime information
     memory_usage_mb: float = 0.0
@@ -107,7 +130,7 @@ class LocalModel:
             'name': self.config.name,
             'display_name': self.config.display_name,
             'status': self.status.value,
-            'model_type': self.config.model_type.value,
+            'model_type': self.config._model_type_value,
             'memory_requirement_mb': self.config.memory_requirement_mb,
             'memory_usage_mb': self.memory_usage_mb,
             'gpu_memory_usage_mb': self.gpu_memory_usage_mb,
@@ -122,8 +145,8 @@ class LocalModel:
         }
 
 
-# Predefined model configurations
-AVAILABLE_MODELS = {
+# Predefined model configurations (read-only; copy to customise)
+AVAILABLE_MODELS: Mapping[str, ModelConfig] = MappingProxyType({
     "code-llama-7b-instruct": ModelConfig(
         name="code-llama-7b-instruct",
         display_name="Code Llama 7B Instruct",
@@ -195,18 +218,19 @@ AVAILABLE_MODELS = {
         architecture="llama",
         parameter_count="7B"
     )
-}
+})
+
+
+# Recommendation tiers: below _RECOMMENDATION_THRESHOLDS_MB[i] MB of free
+# memory, _RECOMMENDED_MODELS[i] is suggested; the last entry (the SQL
+# specialist) applies above every threshold
+_RECOMMENDATION_THRESHOLDS_MB = (4000, 6000)
+_RECOMMENDED_MODELS = ("phi-2", "mistral-7b-instruct", "sqlcoder-7b")
 
 
 def get_recommended_model(available_memory_mb: int, has_gpu: bool = False) -> str:
     """Get recommended model based on system capabilities"""
-    if available_memory_mb < 4000:
-        return "phi-2"
-    elif available_memory_mb < 6000:
-        return "mistral-7b-instruct"
-    else:
-        # Prefer SQL specialist if enough memory
-        return "sqlcoder-7b"
+    return _RECOMMENDED_MODELS[bisect_right(_RECOMMENDATION_THRESHOLDS_MB, available_memory_mb)]
 
 
 def get_model_config(model_name: str) -> Optional[ModelConfig]:
@@ -0,0 +1,449 @@
+"""
+Inference Request Scheduler
+Fair per-tenant admission control for local model inference.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """A request's deadline passed while it was still queued"""
+
+
+@dataclass(slots=True)
+class SchedulerStats:
+    """Counters describing scheduler load"""
+    queue_depth: int = 0
+    in_flight: int = 0
+    submitted: int = 0
+    dispatched: int = 0
+    completed: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    expired: int = 0
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+    @property
+    def avg_wait_time(self) -> float:
+        return self.total_wait_time / self.dispatched if self.dispatched else 0.0
+
+
+@dataclass(slots=True)
+class _Job:
+    """A queued request waiting for a dispatch slot"""
+    tenant_id: str
+    priority: int
+    handler: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    deadline: Optional[float] = None  # time.time() timestamp
+    task: Optional[asyncio.Task] = None
+
+
+class RequestScheduler:
+    """Dispatches requests round-robin across tenants with a priority lane.
+
+    Each priority level keeps one queue per tenant. The dispatcher always
+    serves the lowest priority value first and, within a level, takes one
+    request from each tenant in turn, so a burst from one caller cannot
+    starve the others. A tenant's own requests go earliest-deadline first
+    (FIFO without deadlines), and requests whose deadline has passed are
+    failed with DeadlineExceeded instead of being dispatched. At most
+    ``max_concurrent`` handlers run at once.
+    """
+
+    def __init__(self, max_concurrent: int = 3):
+        self.max_concurrent = max(1, max_concurrent)
+        self.stats = SchedulerStats()
+
+        # priority -> tenant_id -> heap of (deadline, seq, job), tenants in round-robin order
+        self._lanes: Dict[int, OrderedDict[str, List[Tuple[float, int, _Job]]]] = {}
+        self._sequence = itertools.count()
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slot_freed: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: set = set()
+
+    async def submit(self, handler: Callable[[], Awaitable[Any]],
+                     tenant_id: str = "default", priority: int = 0,
+                     deadline: Optional[float] = None) -> Any:
+        """Queue ``handler`` and return its result once it has run.
+
+        Raises DeadlineExceeded if ``deadline`` (a time.time() timestamp)
+        passes before the handler is dispatched.
+        """
+        self._ensure_dispatcher()
+
+        job = _Job(
+            tenant_id=tenant_id,
+            priority=priority,
+            handler=handler,
+            future=asyncio.get_running_loop().create_future(),
+            deadline=deadline,
+        )
+        jobs = self._lanes.setdefault(priority, OrderedDict()).setdefault(tenant_id, [])
+        heapq.heappush(jobs, (math.inf if deadline is None else deadline, next(self._sequence), job))
+        self.stats.queue_depth += 1
+        self.stats.submitted += 1
+        self._wakeup.set()
+
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            # Don't keep generating for a caller that has gone away
+            if job.task is not None:
+                job.task.cancel()
+            raise
+
+    async def close(self):
+        """Stop the dispatcher and fail anything still queued"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+
+        self._cancel_queued()
+
+    def set_max_concurrent(self, max_concurrent: int):
+        """Resize the dispatch limit; running handlers are never interrupted"""
+        self.max_concurrent = max(1, max_concurrent)
+        if self._slot_freed is not None:
+            self._slot_freed.set()  # Let the dispatcher re-check the limit
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get a snapshot of queue and wait-time counters"""
+        stats = self.stats
+        return {
+            'queue_depth': stats.queue_depth,
+            'in_flight': stats.in_flight,
+            'max_concurrent': self.max_concurrent,
+            'submitted': stats.submitted,
+            'dispatched': stats.dispatched,
+            'completed': stats.completed,
+            'failed': stats.failed,
+            'cancelled': stats.cancelled,
+            'expired': stats.expired,
+            'avg_wait_time': stats.avg_wait_time,
+            'max_wait_time': stats.max_wait_time,
+            'tenants_waiting': len({t for tenants in self._lanes.values() for t in tenants}),
+        }
+
+    def _ensure_dispatcher(self):
+        """Start the dispatcher on the running loop if it is not already there"""
+        loop = asyncio.get_running_loop()
+        dispatcher = self._dispatcher
+        if dispatcher is not None and not dispatcher.done() and dispatcher.get_loop() is loop:
+            return
+
+        # A new event loop (or a crashed dispatcher) needs fresh primitives;
+        # anything queued before then would never be dispatched, so fail it
+        # rather than leave its caller waiting forever.
+        self._cancel_queued()
+        self.stats.in_flight = 0
+        self._wakeup = asyncio.Event()
+        self._slot_freed = asyncio.Event()
+        self._dispatcher = loop.create_task(self._dispatch_loop())
+
+    def _cancel_queued(self):
+        """Cancel every queued job's future and empty the lanes"""
+        for tenants in self._lanes.values():
+            for jobs in tenants.values():
+                for _, _, job in jobs:
+                    if not job.future.done():
+                        try:
+                            job.future.cancel()
+                        except RuntimeError:
+                            pass  # Its event loop is already closed
+                        self.stats.cancelled += 1
+        self._lanes.clear()
+        self.stats.queue_depth = 0
+
+    def _pop_next(self) -> Optional[_Job]:
+        """Take the next job: lowest priority value, then round-robin by tenant"""
+        now = None
+        while self._lanes:
+            priority = min(self._lanes)
+            tenants = self._lanes[priority]
+            tenant_id, jobs = next(iter(tenants.items()))
+            job = heapq.heappop(jobs)[2]
+
+            if jobs:
+                tenants.move_to_end(tenant_id)
+            else:
+                del tenants[tenant_id]
+                if not tenants:
+                    del self._lanes[priority]
+
+            self.stats.queue_depth -= 1
+            if job.future.done():
+                # Caller gave up while queued
+                self.stats.cancelled += 1
+                continue
+            if job.deadline is not None:
+                if now is None:
+                    now = time.time()
+                if now > job.deadline:
+                    # Too late to be useful; don't spend compute on it
+                    self.stats.expired += 1
+                    job.future.set_exception(DeadlineExceeded("Deadline exceeded before dispatch"))
+                    continue
+            return job
+        return None
+
+    async def _dispatch_loop(self):
+        """Hand queued jobs to workers as dispatch slots free up"""
+        while True:
+            while self.stats.in_flight >= self.max_concurrent:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+
+            job = self._pop_next()
+            while job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                job = self._pop_next()
+
+            wait_time = time.monotonic() - job.enqueued_at
+            self.stats.total_wait_time += wait_time
+            if wait_time > self.stats.max_wait_time:
+                self.stats.max_wait_time = wait_time
+            self.stats.dispatched += 1
+            self.stats.in_flight += 1
+
+            job.task = asyncio.create_task(self._run(job))
+            self._running.add(job.task)
+            job.task.add_done_callback(self._running.discard)
+
+    async def _run(self, job: _Job):
+        """Run a single job and resolve its future"""
+        try:
+            result = await job.handler()
+        except asyncio.CancelledError:
+            self.stats.cancelled += 1
+            job.future.cancel()
+        except Exception as e:
+            self.stats.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.stats.completed += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self.stats.in_flight -= 1
+            self._slot_freed.set()
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for a RequestScheduler's dispatch limit.
+
+    Feeds on per-request generation speed (seconds per token, smoothed with
+    an EWMA). Every ``window`` completions the limit grows by one while
+    requests stay under ``target_seconds_per_token`` and memory headroom
+    remains, and halves when latency blows past the target or a request
+    runs out of memory.
+    """
+
+    def __init__(self, scheduler: RequestScheduler, target_seconds_per_token: float = 0.2,
+                 min_concurrent: int = 1, max_concurrent: int = 16, window: int = 8,
+                 smoothing: float = 0.2, has_headroom: Optional[Callable[[], bool]] = None):
+        self.scheduler = scheduler
+        self.target = target_seconds_per_token
+        self.min_concurrent = min_concurrent
+        self.max_concurrent = max_concurrent
+        self.window = window
+        self.smoothing = smoothing
+        self.has_headroom = has_headroom or (lambda: True)
+
+        self.ewma_seconds_per_token: Optional[float] = None
+        self.increases = 0
+        self.decreases = 0
+        self._completions = 0
+
+    def record(self, inference_time: float, tokens: int):
+        """Feed one finished request into the controller"""
+        if tokens <= 0:
+            return
+        sample = inference_time / tokens
+        if self.ewma_seconds_per_token is None:
+            self.ewma_seconds_per_token = sample
+        else:
+            self.ewma_seconds_per_token += self.smoothing * (sample - self.ewma_seconds_per_token)
+
+        self._completions += 1
+        if self._completions < self.window:
+            return
+        self._completions = 0
+
+        current = self.scheduler.max_concurrent
+        if self.ewma_seconds_per_token > self.target * 1.5:
+            self._decrease(current)
+        elif (self.ewma_seconds_per_token < self.target and current < self.max_concurrent
+              and self.has_headroom()):
+            self.scheduler.set_max_concurrent(current + 1)
+            self.increases += 1
+
+    def record_oom(self):
+        """Back off immediately after an out-of-memory failure"""
+        self._completions = 0
+        self._decrease(self.scheduler.max_concurrent)
+
+    def _decrease(self, current: int):
+        target = max(self.min_concurrent, current // 2)
+        if target < current:
+            self.scheduler.set_max_concurrent(target)
+            self.decreases += 1
+            logger.info(f"Reduced inference concurrency to {target}")
+
+
+class BatchLoop:
+    """Coalesces requests for one model into batches run by a single task.
+
+    Requests arriving within ``max_wait_ms`` of the first pending one are
+    grouped (up to ``max_batch_size``) and handed to ``run_batch`` together.
+    Only requests with the same ``batch_key`` share a batch, so sampling
+    settings never leak between callers. Because one task owns the model,
+    no lock is needed to keep concurrent callers off it.
+    """
+
+    def __init__(self, run_batch: Callable[[list], Awaitable[list]],
+                 batch_key: Optional[Callable[[Any], Any]] = None,
+                 max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.run_batch = run_batch
+        self.batch_key = batch_key or (lambda item: None)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.batches_run = 0
+        self.items_run = 0
+
+        self._pending: Deque[tuple] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def submit(self, item: Any) -> Any:
+        """Queue ``item`` for the next batch and return its result.
+
+        Raises RuntimeError while ``close()`` is draining, since the batch
+        task may already have made its final pass over the queue.
+        """
+        if self._closing:
+            raise RuntimeError("BatchLoop is closing")
+
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._pending.clear()
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._loop())
+
+        future = loop.create_future()
+        self._pending.append((item, future))
+        self._wakeup.set()
+        return await future
+
+    async def close(self):
+        """Cancel pending requests and wait for the running batch to finish.
+
+        The batch task is the model's only user, so once this returns the
+        model can be torn down without racing a worker thread.
+        """
+        self._closing = True
+        try:
+            while self._pending:
+                _, future = self._pending.popleft()
+                if not future.done():
+                    future.cancel()
+
+            task = self._task
+            self._task = None
+            if task is None or task.done():
+                return
+
+            if task.get_loop() is not asyncio.get_running_loop():
+                task.cancel()  # Loop is gone; nothing left to drain
+                return
+
+            self._wakeup.set()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        finally:
+            self._closing = False
+
+    @property
+    def avg_batch_size(self) -> float:
+        return self.items_run / self.batches_run if self.batches_run else 0.0
+
+    def _take_batch(self) -> list:
+        """Pop up to max_batch_size live entries sharing the oldest entry's key"""
+        batch = []
+        key = None
+        skipped = deque()
+        while self._pending and len(batch) < self.max_batch_size:
+            item, future = self._pending.popleft()
+            if future.done():
+                continue  # Caller gave up
+            item_key = self.batch_key(item)
+            if not batch:
+                key = item_key
+            elif item_key != key:
+                skipped.append((item, future))
+                continue
+            batch.append((item, future))
+
+        # Requests with other settings keep their place at the front
+        skipped.extend(self._pending)
+        self._pending = skipped
+        return batch
+
+    async def _loop(self):
+        """Collect a batch, run it, resolve its futures, repeat"""
+        while True:
+            while not self._pending:
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # Give concurrent callers a short window to join this batch
+            if len(self._pending) < self.max_batch_size and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+
+            batch = self._take_batch()
+            if not batch:
+                continue
+
+            try:
+                results = await self.run_batch([item for item, _ in batch])
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.items_run += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -5,20 +5,47 @@ Handles secure downloads, checksum verification, and safe file operations.
 
 import hashlib
 import logging
+import mmap
 import os
 import tempfile
 import zipfile
 import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, Any
 import urllib.parse
 
 logger = logging.getLogger(__name__)
 
+try:
+    from blake3 import blake3 as _blake3
+except ImportError:
+    _blake3 = None
+
+BLAKE3_AVAILABLE = _blake3 is not None
+
+
+def new_hasher(algorithm: str = 'sha256'):
+    """Create a hash object, including BLAKE3 when the blake3 package is installed
+    
+    BLAKE3 hashes large buffers across all cores. SHA-256 goes through
+    OpenSSL, which uses the CPU's SHA extensions where present.
+    """
+    if algorithm.lower() == 'blake3':
+        if _blake3 is None:
+            raise ValueError("blake3 checksums require the blake3 package")
+        return _blake3(max_threads=_blake3.AUTO)
+    return hashlib.new(algorithm)
+
 
 class ModelSecurityValidator:
     """Validates model files and handles secure operations"""
     
+    CHECKSUM_CHUNK_SIZE = 1024 * 1024  # 1MB
+    DIRECT_IO_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB, a multiple of the 4KB block size
+    DIRECT_IO_WORKERS = 4
+    
     def __init__(self):
         self.allowed_extensions = {'.bin', '.ggml', '.gguf', '.safetensors', '.pt', '.pth'}
         self.max_file_size_gb = 50  # Maximum allowed model file size
@@ -120,12 +147,23 @@ class ModelSecurityValidator:
     def calculate_file_checksum(self, file_path: Path, algorithm: str = 'sha256') -> str:
         """Calculate checksum of a file"""
         try:
-            hash_obj = hashlib.new(algorithm)
+            hash_obj = new_hasher(algorithm)
+            chunk_size = self.CHECKSUM_CHUNK_SIZE
             
-            with open(file_path, 'rb') as f:
-                # Read in chunks to handle large files
-                for chunk in iter(lambda: f.read(8192), b""):
-                    hash_obj.update(chunk)
+            with open(file_path, 'rb', buffering=0) as f:
+                size = os.fstat(f.fileno()).st_size
+                if size:
+                    # Map the file and hash it in 1MB slices; sequential
+                    # read-ahead lets the kernel fetch pages while we hash
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                            mapped.madvise(mmap.MADV_SEQUENTIAL)
+                        view = memoryview(mapped)
+                        try:
+                            for offset in range(0, len(mapped), chunk_size):
+                                hash_obj.update(view[offset:offset + chunk_size])
+                        finally:
+                            view.release()
             
             return hash_obj.hexdigest()
             
@@ -133,9 +171,82 @@ class ModelSecurityValidator:
             logger.error(f"Error calculating checksum for {file_path}: {e}")
             raise
     
+    def calculate_file_checksum_direct(self, file_path: Path, algorithm: str = 'sha256') -> str:
+        """Calculate checksum of a file without filling the page cache
+        
+        Opens the file with O_DIRECT and keeps several 4MB preads in flight
+        on a thread pool while the current chunk is hashed, so a cold NVMe
+        read runs at device speed. Used when verifying models that are not
+        about to be loaded. Falls back to calculate_file_checksum where
+        positional reads are unavailable or the filesystem rejects O_DIRECT.
+        """
+        if not hasattr(os, 'preadv'):
+            return self.calculate_file_checksum(file_path, algorithm)
+        
+        direct = getattr(os, 'O_DIRECT', 0)
+        try:
+            fd = os.open(file_path, os.O_RDONLY | direct)
+        except OSError:
+            if not direct:
+                raise
+            direct = 0
+            fd = os.open(file_path, os.O_RDONLY)
+        
+        try:
+            hash_obj = new_hasher(algorithm)
+            chunk_size = self.DIRECT_IO_CHUNK_SIZE
+            size = os.fstat(fd).st_size
+            
+            def read_chunk(buf: mmap.mmap, offset: int):
+                # O_DIRECT needs an aligned buffer, offset and length; anonymous
+                # maps are page aligned and the final read may come back short
+                n = os.preadv(fd, [buf], offset)
+                if not direct and hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(fd, offset, n, os.POSIX_FADV_DONTNEED)
+                return buf, n
+            
+            offsets = iter(range(0, size, chunk_size))
+            buffers = [mmap.mmap(-1, chunk_size) for _ in range(self.DIRECT_IO_WORKERS)]
+            try:
+                with ThreadPoolExecutor(max_workers=self.DIRECT_IO_WORKERS) as executor:
+                    # Futures complete out of order but are consumed in
+                    # submission order, so the digest sees the file in sequence
+                    pending = deque()
+                    for buf, offset in zip(buffers, offsets):
+                        pending.append((offset, executor.submit(read_chunk, buf, offset)))
+                    
+                    while pending:
+                        offset, future = pending.popleft()
+                        buf, n = future.result()
+                        if n != min(chunk_size, size - offset):
+                            raise IOError(f"Short read at offset {offset} of {file_path}")
+                        with memoryview(buf) as view:
+                            hash_obj.update(view[:n])
+                        next_offset = next(offsets, None)
+                        if next_offset is not None:
+                            pending.append((next_offset, executor.submit(read_chunk, buf, next_offset)))
+            finally:
+                for buf in buffers:
+                    buf.close()
+            
+            return hash_obj.hexdigest()
+            
+        except OSError as e:
+            if direct:
+                logger.debug(f"Direct read of {file_path} failed ({e}), using buffered read")
+                return self.calculate_file_checksum(file_path, algorithm)
+            logger.error(f"Error calculating checksum for {file_path}: {e}")
+            raise
+        finally:
+            os.close(fd)
+    
     def verify_checksum(self, file_path: Path, expected_checksum: str,
-                       algorithm: str = 'sha256') -> bool:
-        """Verify file checksum matches expected value with enhanced security"""
+                       algorithm: str = 'sha256', actual_checksum: Optional[str] = None) -> bool:
+        """Verify file checksum matches expected value with enhanced security
+        
+        actual_checksum may be supplied when the caller already hashed the
+        file's contents (e.g. while downloading it), to skip re-reading it.
+        """
         try:
             # Validate expected checksum format
             if not expected_checksum or not isinstance(expected_checksum, str):
@@ -145,6 +256,7 @@ class ModelSecurityValidator:
             # Validate checksum length based on algorithm
             expected_lengths = {
                 'sha256': 64,
+                'blake3': 64,
                 'sha512': 128,
                 'sha1': 40,
                 'md5': 32
@@ -162,7 +274,8 @@ class ModelSecurityValidator:
                 return False
 
             # Calculate actual checksum
-            actual_checksum = self.calculate_file_checksum(file_path, algorithm)
+            if actual_checksum is None:
+                actual_checksum = self.calculate_file_checksum(file_path, algorithm)
 
             # Use constant-time comparison to prevent timing attacks
             import hmac
@@ -430,7 +543,9 @@ class ModelSecurityValidator:
             logger.error(f"Error creating secure temp file: {e}")
             raise
     
-    def validate_model_file(self, file_path: Path, expected_checksum: str) -> Dict[str, Any]:
+    def validate_model_file(self, file_path: Path, expected_checksum: str,
+                            actual_checksum: Optional[str] = None,
+                            algorithm: str = 'sha256') -> Dict[str, Any]:
         """Comprehensive model file validation"""
         validation_result = {
             'valid': False,
@@ -457,7 +572,9 @@ class ModelSecurityValidator:
                 validation_result['errors'].append("File size exceeds limits")
             
             # Verify checksum
-            checksum_valid = self.verify_checksum(file_path, expected_checksum)
+            checksum_valid = self.verify_checksum(
+                file_path, expected_checksum, algorithm, actual_checksum=actual_checksum
+            )
             validation_result['checks']['checksum'] = checksum_valid
             if not checksum_valid:
                 validation_result['errors'].append("Checksum verification failed")
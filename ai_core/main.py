@@ -8,6 +8,7 @@ import asyncio
 import json
 import sys
 import logging
+from dataclasses import asdict
 from typing import Dict, Any, Optional
 from datetime import datetime
 
@@ -806,7 +807,7 @@ class AICore:
                 return {'success': False, 'error': 'model_name parameter required'}
 
             progress = self.consensus_engine.local_llm_manager.downloader.get_download_progress(model_name)
-            return {'success': True, 'data': progress.__dict__ if progress else None}
+            return {'success': True, 'data': asdict(progress) if progress else None}
         except Exception as e:
             logger.error(f"Error getting download progress: {e}")
             return {'success': False, 'error': str(e)}
@@ -45,6 +45,9 @@ class DatabaseManager:
         self.total_query_time = 0.0
         self.slow_queries = []
 
+        # Long-lived correction manager so its read caches survive across calls
+        self._correction_manager = None
+
     def _setup_encryption(self) -> None:
         """Setup database encryption key management"""
         key_file = self.db_path.parent / ".cortex_key"
@@ -85,6 +88,9 @@ class DatabaseManager:
             await conn.execute(f"PRAGMA key = 'x\"{key_hex}\"'")
 
         # Security and performance settings
+        # auto_vacuum only takes effect on a new database, so it must precede
+        # journal_mode which initializes the file
+        await conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
         await conn.execute("PRAGMA foreign_keys = ON")
         await conn.execute("PRAGMA journal_mode = WAL")
         await conn.execute("PRAGMA synchronous = NORMAL")
@@ -277,6 +283,49 @@ class DatabaseManager:
         CREATE INDEX IF NOT EXISTS idx_session_learning_active ON session_learning(is_active);
         CREATE INDEX IF NOT EXISTS idx_session_learning_session_project ON session_learning(session_id, project_id);
 
+        -- Materialized correction statistics, maintained by triggers so that
+        -- statistics reads are a primary key lookup instead of a table scan
+        CREATE TABLE IF NOT EXISTS correction_stats (
+            project_id TEXT PRIMARY KEY REFERENCES projects(id) ON DELETE CASCADE,
+            total_corrections INTEGER DEFAULT 0 NOT NULL,
+            confidence_sum REAL DEFAULT 0.0 NOT NULL,
+            confidence_count INTEGER DEFAULT 0 NOT NULL,
+            feedback_sum INTEGER DEFAULT 0 NOT NULL,
+            feedback_count INTEGER DEFAULT 0 NOT NULL,
+            positive_feedback_count INTEGER DEFAULT 0 NOT NULL,
+            patterns_learned INTEGER DEFAULT 0 NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS correction_type_stats (
+            project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+            correction_type TEXT NOT NULL,
+            count INTEGER DEFAULT 0 NOT NULL,
+            PRIMARY KEY (project_id, correction_type)
+        );
+
+        -- Backfill statistics for rows written before the tables existed
+        INSERT OR IGNORE INTO correction_stats (
+            project_id, total_corrections, confidence_sum, confidence_count,
+            feedback_sum, feedback_count, positive_feedback_count, patterns_learned
+        )
+        SELECT uc.project_id, COUNT(*),
+               SUM(CASE WHEN uc.confidence > 0 THEN uc.confidence ELSE 0.0 END),
+               SUM(uc.confidence > 0),
+               SUM(COALESCE(uc.feedback_score, 0)),
+               COUNT(uc.feedback_score),
+               SUM(COALESCE(uc.feedback_score, 0) > 0),
+               (SELECT COUNT(*) FROM correction_patterns cp WHERE cp.project_id = uc.project_id)
+        FROM user_corrections uc
+        GROUP BY uc.project_id;
+
+        INSERT OR IGNORE INTO correction_stats (project_id, patterns_learned)
+        SELECT project_id, COUNT(*) FROM correction_patterns GROUP BY project_id;
+
+        INSERT OR IGNORE INTO correction_type_stats (project_id, correction_type, count)
+        SELECT project_id, correction_type, COUNT(*)
+        FROM user_corrections
+        GROUP BY project_id, correction_type;
+
         -- Triggers for automatic maintenance
         CREATE TRIGGER IF NOT EXISTS update_correction_timestamp
         AFTER UPDATE ON user_corrections
@@ -299,6 +348,92 @@ class DatabaseManager:
             UPDATE session_learning SET updated_at = julianday('now') WHERE id = NEW.id;
         END;
 
+        -- Triggers to keep materialized correction statistics current
+        CREATE TRIGGER IF NOT EXISTS correction_stats_insert
+        AFTER INSERT ON user_corrections
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO correction_stats (
+                project_id, total_corrections, confidence_sum, confidence_count,
+                feedback_sum, feedback_count, positive_feedback_count
+            ) VALUES (
+                NEW.project_id, 1,
+                CASE WHEN NEW.confidence > 0 THEN NEW.confidence ELSE 0.0 END,
+                NEW.confidence > 0,
+                COALESCE(NEW.feedback_score, 0),
+                NEW.feedback_score IS NOT NULL,
+                COALESCE(NEW.feedback_score, 0) > 0
+            )
+            ON CONFLICT(project_id) DO UPDATE SET
+                total_corrections = total_corrections + 1,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                confidence_count = confidence_count + excluded.confidence_count,
+                feedback_sum = feedback_sum + excluded.feedback_sum,
+                feedback_count = feedback_count + excluded.feedback_count,
+                positive_feedback_count = positive_feedback_count + excluded.positive_feedback_count;
+
+            INSERT INTO correction_type_stats (project_id, correction_type, count)
+            VALUES (NEW.project_id, NEW.correction_type, 1)
+            ON CONFLICT(project_id, correction_type) DO UPDATE SET count = count + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS correction_stats_delete
+        AFTER DELETE ON user_corrections
+        FOR EACH ROW
+        BEGIN
+            UPDATE correction_stats SET
+                total_corrections = total_corrections - 1,
+                confidence_sum = confidence_sum - CASE WHEN OLD.confidence > 0 THEN OLD.confidence ELSE 0.0 END,
+                confidence_count = confidence_count - (OLD.confidence > 0),
+                feedback_sum = feedback_sum - COALESCE(OLD.feedback_score, 0),
+                feedback_count = feedback_count - (OLD.feedback_score IS NOT NULL),
+                positive_feedback_count = positive_feedback_count - (COALESCE(OLD.feedback_score, 0) > 0)
+            WHERE project_id = OLD.project_id;
+
+            UPDATE correction_type_stats SET count = count - 1
+            WHERE project_id = OLD.project_id AND correction_type = OLD.correction_type;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS correction_stats_update
+        AFTER UPDATE OF correction_type, confidence, feedback_score ON user_corrections
+        FOR EACH ROW
+        BEGIN
+            UPDATE correction_stats SET
+                confidence_sum = confidence_sum
+                    - CASE WHEN OLD.confidence > 0 THEN OLD.confidence ELSE 0.0 END
+                    + CASE WHEN NEW.confidence > 0 THEN NEW.confidence ELSE 0.0 END,
+                confidence_count = confidence_count - (OLD.confidence > 0) + (NEW.confidence > 0),
+                feedback_sum = feedback_sum - COALESCE(OLD.feedback_score, 0) + COALESCE(NEW.feedback_score, 0),
+                feedback_count = feedback_count - (OLD.feedback_score IS NOT NULL) + (NEW.feedback_score IS NOT NULL),
+                positive_feedback_count = positive_feedback_count
+                    - (COALESCE(OLD.feedback_score, 0) > 0) + (COALESCE(NEW.feedback_score, 0) > 0)
+            WHERE project_id = NEW.project_id;
+
+            UPDATE correction_type_stats SET count = count - 1
+            WHERE project_id = OLD.project_id AND correction_type = OLD.correction_type;
+
+            INSERT INTO correction_type_stats (project_id, correction_type, count)
+            VALUES (NEW.project_id, NEW.correction_type, 1)
+            ON CONFLICT(project_id, correction_type) DO UPDATE SET count = count + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS correction_stats_pattern_insert
+        AFTER INSERT ON correction_patterns
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO correction_stats (project_id, patterns_learned)
+            VALUES (NEW.project_id, 1)
+            ON CONFLICT(project_id) DO UPDATE SET patterns_learned = patterns_learned + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS correction_stats_pattern_delete
+        AFTER DELETE ON correction_patterns
+        FOR EACH ROW
+        BEGIN
+            UPDATE correction_stats SET patterns_learned = patterns_learned - 1
+            WHERE project_id = OLD.project_id;
+        END;
+
         -- Trigger to automatically clean up expired session learning
         CREATE TRIGGER IF NOT EXISTS cleanup_expired_sessions
         AFTER INSERT ON session_learning
@@ -324,7 +459,7 @@ class DatabaseManager:
         END;
 
         -- Insert schema version
-        INSERT OR REPLACE INTO db_metadata (key, value) VALUES ('schema_version', '1.2');
+        INSERT OR REPLACE INTO db_metadata (key, value) VALUES ('schema_version', '1.3');
         INSERT OR REPLACE INTO db_metadata (key, value) VALUES ('created_at', julianday('now'));
         INSERT OR REPLACE INTO db_metadata (key, value) VALUES ('correction_learning_enabled', 'true');
         """
@@ -777,6 +912,9 @@ class DatabaseManager:
 
     async def close(self) -> None:
         """Close all database connections"""
+        if self._correction_manager is not None:
+            await self._correction_manager.close()
+
         async with self.pool_lock:
             for conn in self.connection_pool:
                 await conn.close()
@@ -785,20 +923,21 @@ class DatabaseManager:
         logger.info("Database connections closed")
 
     # Correction Learning Methods
+    def get_correction_manager(self):
+        """Get the shared correction manager for this database"""
+        if self._correction_manager is None:
+            from ..corrections.manager import CorrectionManager
+            self._correction_manager = CorrectionManager(self)
+        return self._correction_manager
+
     async def get_session_learning(self, session_id: str, project_id: str):
         """Get session learning data"""
-        from ..corrections.manager import CorrectionManager
-        correction_manager = CorrectionManager(self)
-        return await correction_manager.get_session_learning(session_id, project_id)
+        return await self.get_correction_manager().get_session_learning(session_id, project_id)
 
     async def store_session_learning(self, session_learning):
         """Store session learning data"""
-        from ..corrections.manager import CorrectionManager
-        correction_manager = CorrectionManager(self)
-        return await correction_manager.store_session_learning(session_learning)
+        return await self.get_correction_manager().store_session_learning(session_learning)
 
     async def cleanup_expired_session_learning(self):
         """Clean up expired session learning data"""
-        from ..corrections.manager import CorrectionManager
-        correction_manager = CorrectionManager(self)
-        return await correction_manager.cleanup_expired_session_learning()
+        return await self.get_correction_manager().cleanup_expired_session_learning()
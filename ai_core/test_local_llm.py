@@ -5,17 +5,31 @@ Tests all components of the local LLM implementation.
 """
 
 import asyncio
+import gc
+import hashlib
+import os
 import pytest
 import tempfile
+import threading
 import shutil
+import struct
+import time
+import warnings
 from pathlib import Path
 from unittest.mock import Mock, patch, AsyncMock
 
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
 # Import local LLM components
 from local_llm.manager import LocalLLMManager
-from local_llm.models import ModelConfig, ModelType, ModelStatus
-from local_llm.downloader import ModelDownloader
+from local_llm.models import ModelConfig, ModelType, ModelStatus, get_model_config
+from local_llm.downloader import (
+    DownloadProgress, ModelDownloader, _ProgressTracker, _ResumeState, _split_ranges
+)
 from local_llm.inference import LocalInferenceEngine, InferenceRequest
+from local_llm.scheduler import BatchLoop, DeadlineExceeded, RequestScheduler
+from local_llm.gguf_metadata import read_gguf_metadata
 from local_llm.hardware import HardwareDetector
 from local_llm.security import ModelSecurityValidator, run_security_vulnerability_scan
 
@@ -118,6 +132,24 @@ class TestHardwareDetector:
         
         assert isinstance(time_estimate, float)
         assert time_estimate > 0
+    
+    def test_probe_results_cached_on_disk(self):
+        """Test hardware probe results are reused from the disk cache"""
+        temp_dir = Path(tempfile.mkdtemp())
+        try:
+            cache_file = temp_dir / ".hw_cache.json"
+            first = HardwareDetector(cache_file).get_hardware_capabilities()
+            assert cache_file.exists()
+            
+            detector = HardwareDetector(cache_file)
+            with patch.object(detector, '_probe_devices') as probe:
+                second = detector.get_hardware_capabilities()
+            
+            probe.assert_not_called()
+            assert second.cpu_model == first.cpu_model
+            assert len(second.gpus) == len(first.gpus)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 class TestModelDownloader:
@@ -166,6 +198,210 @@ class TestModelDownloader:
         assert cleaned == 2
         assert not temp_file1.exists()
         assert not temp_file2.exists()
+    
+    @pytest.mark.asyncio
+    async def test_download_session_reused_until_close(self):
+        """Test back-to-back downloads share one HTTP session until close()"""
+        sessions = []
+        
+        async def open_session_then_fail(*args, **kwargs):
+            sessions.append(self.downloader._get_session())
+            raise ValueError("offline")
+        
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            async with ModelDownloader(self.temp_dir) as downloader:
+                downloader._get_session()
+            assert downloader._session is None
+            
+            with patch.object(self.downloader, '_download_with_progress',
+                              side_effect=open_session_then_fail):
+                assert not await self.downloader.download_model(get_model_config("phi-2"))
+                assert not await self.downloader.download_model(get_model_config("phi-2"))
+            
+            assert sessions[0] is sessions[1]
+            assert not sessions[0].closed
+            await self.downloader.close()
+            assert sessions[0].closed
+            
+            del downloader, sessions
+            gc.collect()
+        
+        assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
+    
+    def test_split_ranges_covers_file(self):
+        """Test byte ranges for parallel downloads are contiguous and complete"""
+        ranges = _split_ranges(10 * 1024 + 3, 4)
+        
+        assert len(ranges) == 4
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == 10 * 1024 + 2
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert start == end + 1
+
+    async def _serve(self, data, honor_range=lambda index: True, cut_first_at=None):
+        """Serve data with optional Range support, recording each request's Range header
+
+        With cut_first_at the first response drops its connection after that
+        many body bytes.
+        """
+        requests = []
+
+        async def handler(request):
+            index = len(requests)
+            range_header = request.headers.get('Range')
+            requests.append(range_header)
+
+            start, end, status = 0, len(data) - 1, 200
+            if range_header and honor_range(index):
+                first, _, last = range_header.split('=', 1)[1].partition('-')
+                start, end, status = int(first), int(last) if last else len(data) - 1, 206
+
+            body = data[start:end + 1]
+            headers = {'Content-Range': f'bytes {start}-{end}/{len(data)}'} if status == 206 else {}
+            if cut_first_at is None or index > 0:
+                return web.Response(body=body, status=status, headers=headers)
+
+            response = web.StreamResponse(status=status, headers=headers)
+            response.content_length = len(body)
+            await response.prepare(request)
+            await response.write(body[:cut_first_at])
+            request.transport.close()
+            return response
+
+        app = web.Application()
+        app.router.add_get('/model.bin', handler)
+        server = TestServer(app)
+        await server.start_server()
+        return server, requests
+
+    def _config_for(self, server, data):
+        return ModelConfig(
+            name="served-model",
+            display_name="Served Model",
+            model_type=ModelType.GENERAL_PURPOSE,
+            download_url=str(server.make_url('/model.bin')),
+            checksum_sha256=hashlib.sha256(data).hexdigest(),
+            file_size_mb=len(data) / (1024 * 1024),
+            memory_requirement_mb=200,
+            context_length=2048
+        )
+
+    async def _download(self, config):
+        with patch.object(self.downloader.security_validator, 'validate_download_url', return_value=True):
+            return await self.downloader.download_model(config)
+
+    @pytest.mark.asyncio
+    async def test_parallel_range_download(self):
+        """Test a large file is fetched over several Range requests and reassembled"""
+        data = os.urandom(1024 * 1024 + 7)
+        self.downloader.parallel_min_bytes = 1
+        self.downloader.min_range_bytes = 256 * 1024
+        self.downloader.chunk_size = 64 * 1024
+
+        # The preallocated temp file must be exactly the payload when verified
+        validate = self.downloader.security_validator.validate_model_file
+        verified_sizes = []
+
+        def validate_and_record(path, *args, **kwargs):
+            verified_sizes.append(path.stat().st_size)
+            return validate(path, *args, **kwargs)
+
+        server, requests = await self._serve(data)
+        try:
+            config = self._config_for(server, data)
+            with patch.object(self.downloader.security_validator, 'validate_model_file',
+                              side_effect=validate_and_record):
+                assert await self._download(config)
+        finally:
+            await self.downloader.close()
+            await server.close()
+
+        assert verified_sizes == [len(data)]
+        assert requests[0] == 'bytes=0-'
+        assert len(requests) == 4
+        assert all(header.startswith('bytes=') and not header.endswith('-') for header in requests[1:])
+        model_path = self.temp_dir / config.filename
+        assert model_path.read_bytes() == data
+        assert hashlib.sha256(model_path.read_bytes()).hexdigest() == config.checksum_sha256
+
+    @pytest.mark.asyncio
+    async def test_download_falls_back_when_range_ignored(self):
+        """Test a server that ignores Range is streamed in one sequential request"""
+        data = os.urandom(512 * 1024 + 3)
+        self.downloader.parallel_min_bytes = 1
+        self.downloader.min_range_bytes = 64 * 1024
+
+        server, requests = await self._serve(data, honor_range=lambda index: False)
+        try:
+            config = self._config_for(server, data)
+            assert await self._download(config)
+        finally:
+            await self.downloader.close()
+            await server.close()
+
+        assert requests == ['bytes=0-']
+        assert (self.temp_dir / config.filename).read_bytes() == data
+
+    @pytest.mark.asyncio
+    async def test_short_body_is_not_hashed(self):
+        """Test a body shorter than Content-Length fails instead of hashing zero padding"""
+        data = os.urandom(1000)
+        temp_file = self.temp_dir / "partial.bin"
+        temp_file.touch()
+        response = Mock(headers={'content-length': str(len(data) + 24)})
+        response.content.readany = AsyncMock(side_effect=[data, b''])
+        progress = DownloadProgress("partial", 0.0, 0.0, 0.0, 0.0, 0.0, "starting")
+        tracker = _ProgressTracker(progress, None, 64 * 1024)
+        resume_state = _ResumeState()
+
+        with pytest.raises(RuntimeError):
+            await self.downloader._stream_response(response, temp_file, progress, tracker, resume_state)
+
+        # Only the received bytes count, so a retry resumes right after them
+        assert resume_state.written_bytes == len(data)
+        assert temp_file.read_bytes()[:len(data)] == data
+
+    @pytest.mark.asyncio
+    async def test_interrupted_download_resumes_with_range(self):
+        """Test a cut transfer is resumed from where it stopped, not restarted"""
+        data = os.urandom(512 * 1024 + 3)
+        self.downloader.chunk_size = 64 * 1024
+
+        # The first request gets a plain 200 (sequential download) and is cut
+        server, requests = await self._serve(data, honor_range=lambda index: index > 0,
+                                             cut_first_at=300 * 1024)
+        try:
+            config = self._config_for(server, data)
+            assert await self._download(config)
+        finally:
+            await self.downloader.close()
+            await server.close()
+
+        assert len(requests) == 2
+        resumed_from = int(requests[1].removeprefix('bytes=').removesuffix('-'))
+        assert requests[1] == f'bytes={resumed_from}-'
+        assert 0 < resumed_from <= 300 * 1024
+        assert (self.temp_dir / config.filename).read_bytes() == data
+
+    @pytest.mark.asyncio
+    async def test_interrupted_download_restarts_when_resume_refused(self):
+        """Test a server answering 200 to a resume request restarts the file cleanly"""
+        data = os.urandom(512 * 1024 + 3)
+        self.downloader.chunk_size = 64 * 1024
+
+        server, requests = await self._serve(data, honor_range=lambda index: False,
+                                             cut_first_at=300 * 1024)
+        try:
+            config = self._config_for(server, data)
+            assert await self._download(config)
+        finally:
+            await self.downloader.close()
+            await server.close()
+
+        assert len(requests) == 2
+        assert requests[1] != 'bytes=0-' and requests[1].endswith('-')
+        assert (self.temp_dir / config.filename).read_bytes() == data
 
 
 class TestLocalInferenceEngine:
@@ -205,6 +441,234 @@ class TestLocalInferenceEngine:
         assert 'loaded_models' in usage
         assert usage['loaded_models'] == 0
 
+    @pytest.mark.asyncio
+    async def test_load_model_without_weakref_support(self):
+        """Test that a model handle that can't be weakly referenced still loads"""
+        class NativeHandle:
+            __slots__ = ()
+
+        async def fake_load(model):
+            model.model_instance = NativeHandle()
+            return True
+
+        config = get_model_config("sqlcoder-7b")
+        (self.temp_dir / config.filename).write_bytes(b"GGUF")
+
+        with patch.object(self.engine, '_load_model_implementation', side_effect=fake_load):
+            assert await self.engine.load_model(config)
+
+        assert self.engine.loaded_models[config.name].status == ModelStatus.LOADED
+        assert await self.engine.unload_model(config.name)
+        await self.engine.scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_llama_cpp_results_not_held_for_later_requests(self):
+        """Test that an early llama.cpp request returns before later ones finish"""
+        release = {"first": threading.Event(), "second": threading.Event()}
+
+        class FakeLlama:
+            def __call__(self, prompt, **kwargs):
+                return self.create_completion(prompt, **kwargs)
+
+            def create_completion(self, prompt, **kwargs):
+                release[prompt].wait(5)
+                return {'choices': [{'text': prompt.upper()}], 'usage': {'completion_tokens': 1}}
+
+        async def fake_load(model):
+            model.model_instance = FakeLlama()
+            return True
+
+        config = get_model_config("sqlcoder-7b")
+        (self.temp_dir / config.filename).write_bytes(b"GGUF")
+        with patch.object(self.engine, '_load_model_implementation', side_effect=fake_load):
+            assert await self.engine.load_model(config)
+
+        first = asyncio.create_task(self.engine.generate(InferenceRequest(prompt="first"), config.name))
+        second = asyncio.create_task(self.engine.generate(InferenceRequest(prompt="second"), config.name))
+        await asyncio.sleep(0.05)
+
+        release["first"].set()
+        response = await asyncio.wait_for(first, timeout=2)
+        assert response.text == "FIRST"
+        assert not second.done()
+
+        release["second"].set()
+        assert (await second).text == "SECOND"
+        await self.engine.unload_model(config.name)
+        await self.engine.scheduler.close()
+    
+    def test_gpu_layers_from_gguf_header(self):
+        """Test GPU layer planning from a GGUF header"""
+        def gguf_string(value):
+            return struct.pack('<Q', len(value)) + value.encode()
+        
+        metadata = [
+            ('general.architecture', 8, gguf_string('llama')),
+            ('llama.block_count', 4, struct.pack('<I', 2)),
+            ('llama.attention.head_count', 4, struct.pack('<I', 4)),
+            ('llama.embedding_length', 4, struct.pack('<I', 64)),
+            ('tokenizer.ggml.scores', 9, struct.pack('<IQ3f', 6, 3, 0.0, 0.0, 0.0)),
+        ]
+        tensors = [('token_embd.weight', 0), ('blk.0.attn.weight', 1024), ('blk.1.attn.weight', 3072)]
+        
+        header = b'GGUF' + struct.pack('<IQQ', 3, len(tensors), len(metadata))
+        for key, value_type, value in metadata:
+            header += gguf_string(key) + struct.pack('<I', value_type) + value
+        for name, offset in tensors:
+            header += gguf_string(name) + struct.pack('<IQIQ', 1, 1, 0, offset)
+        header += b'\0' * (-len(header) % 32)
+        
+        model_path = self.temp_dir / "tiny.gguf"
+        model_path.write_bytes(header + b'\1' * 5120)
+        
+        info = read_gguf_metadata(model_path)
+        assert info.n_layer == 2
+        assert info.n_head_kv == 4
+        assert info.layer_bytes == 2048
+        assert info.non_repeating_bytes == 1024
+        assert read_gguf_metadata(Path(__file__)) is None
+        
+        self.engine.gpu_scratch_mb = 0
+        assert self.engine._calculate_gpu_layers(info, 1, n_ctx=1024) == -1
+        assert self.engine._calculate_gpu_layers(info, 1, n_ctx=2048) == 1
+
+
+class TestRequestScheduler:
+    """Test fair request scheduling"""
+    
+    @pytest.mark.asyncio
+    async def test_round_robin_across_tenants(self):
+        """Test that a burst from one tenant does not starve another"""
+        scheduler = RequestScheduler(max_concurrent=1)
+        order = []
+        gate = asyncio.Event()
+        
+        async def blocker():
+            await gate.wait()
+        
+        def job(tag):
+            async def run():
+                order.append(tag)
+                return tag
+            return run
+        
+        first = asyncio.create_task(scheduler.submit(blocker, tenant_id="a"))
+        await asyncio.sleep(0)
+        
+        tasks = [asyncio.create_task(scheduler.submit(job(f"a{i}"), tenant_id="a")) for i in range(3)]
+        tasks.append(asyncio.create_task(scheduler.submit(job("b0"), tenant_id="b")))
+        tasks.append(asyncio.create_task(scheduler.submit(job("urgent"), tenant_id="c", priority=-1)))
+        await asyncio.sleep(0)
+        
+        gate.set()
+        results = await asyncio.gather(first, *tasks)
+        await scheduler.close()
+        
+        assert order == ["urgent", "a0", "b0", "a1", "a2"]
+        assert results[1:] == ["a0", "a1", "a2", "b0", "urgent"]
+        assert scheduler.get_stats()['completed'] == 6
+    
+    @pytest.mark.asyncio
+    async def test_expired_requests_are_not_dispatched(self):
+        """Test that requests past their deadline are dropped before running"""
+        scheduler = RequestScheduler(max_concurrent=1)
+        ran = []
+        gate = asyncio.Event()
+        
+        async def blocker():
+            await gate.wait()
+        
+        async def job():
+            ran.append(True)
+        
+        first = asyncio.create_task(scheduler.submit(blocker))
+        await asyncio.sleep(0)
+        late = asyncio.create_task(scheduler.submit(job, deadline=time.time() - 1))
+        await asyncio.sleep(0)
+        
+        gate.set()
+        await first
+        with pytest.raises(DeadlineExceeded):
+            await late
+        await scheduler.close()
+        
+        assert ran == []
+        assert scheduler.get_stats()['expired'] == 1
+
+    @pytest.mark.asyncio
+    async def test_dispatcher_restart_fails_queued_jobs(self):
+        """Test that jobs queued behind a crashed dispatcher do not hang"""
+        scheduler = RequestScheduler(max_concurrent=1)
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def failing():
+            raise ValueError("boom")
+
+        first = asyncio.create_task(scheduler.submit(blocker))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(scheduler.submit(failing))
+        await asyncio.sleep(0)
+
+        scheduler._dispatcher.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        await first
+
+        with pytest.raises(ValueError):
+            await scheduler.submit(failing)
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(queued, timeout=1)
+        await scheduler.close()
+
+        stats = scheduler.get_stats()
+        assert stats['completed'] == 1
+        assert stats['failed'] == 1
+        assert stats['cancelled'] == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_loop_groups_by_key(self):
+        """Test that concurrent requests are batched only with matching settings"""
+        batches = []
+        
+        async def run_batch(items):
+            batches.append([name for name, _ in items])
+            return [name.upper() for name, _ in items]
+        
+        batch_loop = BatchLoop(run_batch, batch_key=lambda item: item[1], max_batch_size=3)
+        items = [("a", 1), ("b", 2), ("c", 1), ("d", 1), ("e", 1)]
+        results = await asyncio.gather(*(batch_loop.submit(item) for item in items))
+        await batch_loop.close()
+        
+        assert results == ["A", "B", "C", "D", "E"]
+        assert batches == [["a", "c", "d"], ["b"], ["e"]]
+
+    @pytest.mark.asyncio
+    async def test_batch_loop_rejects_submit_while_closing(self):
+        """Test that a request arriving mid-close fails instead of hanging"""
+        gate = asyncio.Event()
+
+        async def run_batch(items):
+            await gate.wait()
+            return items
+
+        batch_loop = BatchLoop(run_batch, max_wait_ms=0)
+        running = asyncio.create_task(batch_loop.submit("a"))
+        await asyncio.sleep(0.01)
+        closing = asyncio.create_task(batch_loop.close())
+        await asyncio.sleep(0)
+
+        with pytest.raises(RuntimeError):
+            await batch_loop.submit("b")
+
+        gate.set()
+        await closing
+        assert await running == "a"
+        assert await batch_loop.submit("c") == "c"
+        await batch_loop.close()
+
 
 @pytest.mark.asyncio
 class TestLocalLLMManager:
@@ -245,7 +709,17 @@ class TestLocalLLMManager:
             results = await self.manager.run_security_scan()
             assert results['scan_completed']
             assert results['vulnerabilities_found'] == 0
-    
+
+    async def test_unchanged_refresh_keeps_model_listing_cached(self):
+        """Test that refreshing unchanged model states doesn't rebuild listings"""
+        await self.manager.refresh_model_states()
+        first = self.manager.get_available_models()
+        version = self.manager._state_version
+
+        await self.manager.refresh_model_states()
+        assert self.manager._state_version == version
+        assert self.manager.get_available_models() == first
+
     def test_get_available_models(self):
         """Test getting available models"""
         models = self.manager.get_available_models()
@@ -320,15 +794,18 @@ class TestIntegration:
             }
             
             manager = LocalLLMManager(self.temp_dir)
-            success = await manager.initialize()
-            
-            assert success
-            assert manager.security_scan_completed
-            
-            # Test system status
-            status = manager.get_system_status()
-            assert status['security_scan_completed']
-            assert status['security_vulnerabilities'] == 0
+            try:
+                success = await manager.initialize()
+                
+                assert success
+                assert manager.security_scan_completed
+                
+                # Test system status
+                status = manager.get_system_status()
+                assert status['security_scan_completed']
+                assert status['security_vulnerabilities'] == 0
+            finally:
+                await manager.cleanup()
     
     def test_model_configuration_validation(self):
         """Test model configuration validation"""